@@ -0,0 +1,165 @@
+import datetime
+import json
+
+from flask import Blueprint, abort, current_app, request
+
+from config import cache, replicas
+from models import *
+from queries import venue_list, venue_data, venue_detail, artist_list, artist_detail, shows_page, show_data
+from queries import venue_validator, artist_validator, venues_validator, artists_validator, shows_validator
+from utils import parse_show_filters, query_budget, conditional
+from schedule import find_conflicts, show_intervals
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# /api/v1 serves the same data as the HTML pages from the same loaders in
+# queries.py, without template rendering. Every endpoint accepts
+#   fields=a,b   keep only these keys of each returned object
+# and list endpoints page with limit plus an opaque cursor ("next" in the
+# response); /venues and /artists also filter on genre=<name>. ETags come
+# from the same validators as the HTML pages, so If-None-Match is answered
+# with 304 before any body query runs. /shows/conflicts is not cached: the
+# show forms ask it right before submitting. orjson is used for encoding
+# when it is installed.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def _default(value):
+  if isinstance(value, (datetime.date, datetime.datetime)):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+def dumps(payload):
+  if orjson is not None:
+    return orjson.dumps(payload, default=_default)
+  return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+def _select_fields(item):
+  fields = request.args.get('fields')
+  if not fields:
+    return item
+  fields = fields.split(',')
+  unknown = [field for field in fields if field not in item]
+  if unknown:
+    abort(400, 'unknown fields: %s' % ', '.join(unknown))
+  return {field: item[field] for field in fields}
+
+def json_response(data, next_cursor=None, paged=False):
+  if isinstance(data, list):
+    data = [_select_fields(item) for item in data]
+  else:
+    data = _select_fields(data)
+  payload = {'data': data, 'next': next_cursor} if paged else {'data': data}
+  return current_app.response_class(dumps(payload), mimetype='application/json')
+
+def _int_arg(name, default):
+  # a non-negative integer query argument; 400 on anything else rather than the default
+  value = request.args.get(name)
+  if value is None:
+    return default
+  try:
+    value = int(value)
+  except ValueError:
+    abort(400)
+  if value < 0:
+    abort(400)
+  return value
+
+def _id_page(query, id_column):
+  # keyset page of a list ordered by id; the cursor is the last id seen
+  limit = min(_int_arg('limit', current_app.config['API_PAGE_SIZE']), current_app.config['API_MAX_PAGE_SIZE'])
+  after = _int_arg('cursor', 0)
+  if limit < 1:
+    abort(400)
+  rows = query.filter(id_column > after).order_by(id_column).limit(limit + 1).all()
+  next_cursor = str(rows[limit - 1].id) if len(rows) > limit else None
+  return rows[:limit], next_cursor
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+  response = current_app.response_class(dumps({'error': error.description}), mimetype='application/json')
+  return response, error.code
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@replicas.read_only
+@cache.cached('venues')
+@conditional(venues_validator)
+def venues():
+  rows, next_cursor = _id_page(venue_list(request.args.get('genre')), Venue.id)
+  return json_response([dict(venue_data(row), city=row.city, state=row.state) for row in rows], next_cursor, paged=True)
+
+@api.route('/venues/<int:venue_id>')
+@replicas.read_only
+@cache.cached(lambda venue_id: 'show_venue:%s' % venue_id)
+@conditional(venue_validator)
+@query_budget(2)
+def venue(venue_id):
+  data = venue_detail(venue_id)
+  if data is None:
+    abort(404, 'venue %d not found' % venue_id)
+  return json_response(data)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@cache.cached('artists')
+@conditional(artists_validator)
+def artists():
+  rows, next_cursor = _id_page(artist_list(request.args.get('genre')), Artist.id)
+  return json_response([{'id': row.id, 'name': row.name} for row in rows], next_cursor, paged=True)
+
+@api.route('/artists/<int:artist_id>')
+@replicas.read_only
+@cache.cached(lambda artist_id: 'show_artist:%s' % artist_id)
+@conditional(artist_validator)
+@query_budget(2)
+def artist(artist_id):
+  data = artist_detail(artist_id)
+  if data is None:
+    abort(404, 'artist %d not found' % artist_id)
+  return json_response(data)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@replicas.read_only
+@cache.cached('shows')
+@conditional(shows_validator)
+def shows():
+  try:
+    filters = parse_show_filters(request.args)
+  except ValueError as error:
+    abort(400, str(error))
+  rows, next_cursor = shows_page(**filters)
+  return json_response([show_data(row) for row in rows], next_cursor, paged=True)
+
+@api.route('/shows/conflicts')
+def show_conflicts():
+  # shows that a booking of venue_id and/or artist_id at start_time (ISO) for
+  # duration minutes would overlap
+  venue_id = request.args.get('venue_id', type=int)
+  artist_id = request.args.get('artist_id', type=int)
+  if venue_id is None and artist_id is None:
+    abort(400, 'venue_id or artist_id is required')
+  try:
+    start_time = datetime.datetime.fromisoformat(request.args.get('start_time', ''))
+    duration = request.args.get('duration', type=int)
+    intervals = show_intervals([start_time], datetime.timedelta(minutes=duration) if duration else None)
+  except ValueError as error:
+    abort(400, str(error))
+  return json_response([{'id': row.id, 'venue_id': row.venue_id, 'artist_id': row.artist_id,
+                         'start_time': row.start_time, 'end_time': row.end_time}
+                        for row in find_conflicts(venue_id, artist_id, intervals)])
@@ -0,0 +1,181 @@
+import asyncio
+import collections
+import concurrent.futures
+import io
+import sys
+import types
+
+from flask import render_template, request, session
+from sqlalchemy import select
+
+from app import app
+from api import json_response
+from asyncdb import AsyncDatabase
+from models import *
+from queries import venue_page, venue_shows, venue_validator_query, artist_page, artist_shows, artist_validator_query
+from queries import owner_validator
+from utils import validator_etag, not_modified, set_validators
+
+#----------------------------------------------------------------------------#
+# Async serving mode (optional).
+#
+#     pip install asyncpg uvicorn
+#     DATABASE_URL=postgresql://... uvicorn asgi:application --workers 4
+#
+# The venue and artist pages (HTML and /api/v1) are answered on the event
+# loop: the validator runs first, and unless the client's ETag matches, the
+# entity, its genres and its shows are fetched concurrently over three pooled
+# asyncpg connections. Every other request is handed to the regular Flask app
+# on a thread pool, response buffered; use gunicorn (wsgi) for the plain sync
+# mode. The response cache and @query_budget only apply to the sync views.
+#
+# Flask's request context is thread-local, not task-local, so it is only ever
+# pushed between awaits, never across one.
+#----------------------------------------------------------------------------#
+
+Page = collections.namedtuple('Page', ['statements', 'build', 'render'])
+
+def _genre_statement(tag_model, owner_key, owner_id):
+  return select([Genre.name]).select_from(tag_model.__table__.join(Genre.__table__)).where(owner_key == owner_id)
+
+PAGES = {
+  'venues.show_venue': Page(
+    lambda venue_id: (venue_validator_query(venue_id), Venue.__table__.select().where(Venue.id == venue_id),
+                      _genre_statement(GenreTagsForVenues, GenreTagsForVenues.venue_id, venue_id), venue_shows(venue_id)),
+    venue_page, lambda data: render_template('pages/show_venue.html', venue=data)),
+  'artists.show_artist': Page(
+    lambda artist_id: (artist_validator_query(artist_id), Artist.__table__.select().where(Artist.id == artist_id),
+                       _genre_statement(GenreTagsForArtists, GenreTagsForArtists.artist_id, artist_id), artist_shows(artist_id)),
+    artist_page, lambda data: render_template('pages/show_artist.html', artist=data)),
+}
+PAGES['api.venue'] = PAGES['venues.show_venue']._replace(render=json_response)
+PAGES['api.artist'] = PAGES['artists.show_artist']._replace(render=json_response)
+
+def _row(record):
+  return types.SimpleNamespace(**record)
+
+def _environ(scope, body=b''):
+  server = scope.get('server') or ('localhost', 80)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+    'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+    'QUERY_STRING': scope['query_string'].decode('latin-1'),
+    'SERVER_NAME': server[0],
+    'SERVER_PORT': str(server[1]),
+    'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+    'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BytesIO(body),
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+  }
+  for name, value in scope['headers']:
+    name = name.decode('latin-1').upper().replace('-', '_')
+    key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+    value = value.decode('latin-1')
+    environ[key] = environ[key] + ',' + value if key in environ else value
+  return environ
+
+async def _send_response(send, status, headers, body):
+  await send({'type': 'http.response.start', 'status': status,
+              'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+  await send({'type': 'http.response.body', 'body': body})
+
+
+class AsyncApplication(object):
+  def __init__(self, app):
+    self.app = app
+    self.database = AsyncDatabase(app.config)
+    # one thread per pooled sync connection is enough for the WSGI fallback
+    self.executor = concurrent.futures.ThreadPoolExecutor(app.config['DB_POOL_SIZE'] + app.config['DB_MAX_OVERFLOW'])
+    self._opening = None
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    if scope['type'] != 'http':
+      return
+    if scope['method'] in ('GET', 'HEAD') and await self.page(scope, send):
+      return
+    await self.wsgi(scope, receive, send)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await self.open()
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await self.database.close()
+        self.executor.shutdown()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  async def open(self):
+    # shared by concurrent first requests when the server skips lifespan
+    if self._opening is None:
+      self._opening = asyncio.ensure_future(self.database.open())
+    await self._opening
+
+  async def page(self, scope, send):
+    # answers one detail page; False hands the request to the WSGI app
+    # (other routes, pending flash messages, unknown ids)
+    context = self.app.request_context(_environ(scope))
+    with context:
+      page = PAGES.get(request.endpoint)
+      if page is None or session.get('_flashes'):
+        return False
+      validator, entity, genres, shows = page.statements(**request.view_args)
+
+    await self.open()
+    row = await self.database.fetchrow(validator)
+    validated = owner_validator(tuple(row) if row else None)
+    if validated is None:
+      return False
+    with context:
+      etag = validator_etag(validated)
+      response = not_modified(etag) if etag in request.if_none_match else None
+    if response is None:
+      entity, genres, shows = await asyncio.gather(
+        self.database.fetchrow(entity), self.database.fetch(genres), self.database.fetch(shows))
+      if entity is None:
+        return False
+      with context:
+        data = page.build(_row(entity), [row['name'] for row in genres], [_row(row) for row in shows])
+        response = set_validators(self.app.make_response(page.render(data)), etag, validated)
+    with context:
+      response = self.app.process_response(response)
+
+    body = b'' if scope['method'] == 'HEAD' else b''.join(response.iter_encoded())
+    await _send_response(send, response.status_code, response.headers.items(), body)
+    return True
+
+  async def wsgi(self, scope, receive, send):
+    body = []
+    while True:
+      message = await receive()
+      body.append(message.get('body', b''))
+      if not message.get('more_body'):
+        break
+    environ = _environ(scope, b''.join(body))
+    status, headers, chunks = await asyncio.get_event_loop().run_in_executor(self.executor, self.run_wsgi, environ)
+    await _send_response(send, status, headers, chunks)
+
+  def run_wsgi(self, environ):
+    started = {}
+    def start_response(status, headers, exc_info=None):
+      started['status'], started['headers'] = int(status.split(' ', 1)[0]), headers
+    result = self.app(environ, start_response)
+    try:
+      body = b''.join(result)
+    finally:
+      if hasattr(result, 'close'):
+        result.close()
+    return started['status'], started['headers'], body
+
+
+application = AsyncApplication(app)
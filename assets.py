@@ -0,0 +1,248 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+try:
+  import rcssmin
+except ImportError:
+  rcssmin = None
+
+try:
+  import rjsmin
+except ImportError:
+  rjsmin = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+# `flask assets build` concatenates and minifies the BUNDLES, copies every
+# other file under static/ and writes all of them to static/dist/ with a
+# content hash in the name (css/app.css -> dist/css/app.3f9c0a1b2c4d.css),
+# next to .gz and, with the brotli package, .br variants of the text files.
+# static/dist/manifest.json maps the original names to the hashed ones.
+#
+# When the manifest exists, url_for('static', filename=...) and
+# asset_urls(bundle) in templates point at the hashed files, which are
+# served precompressed per Accept-Encoding with a year-long immutable
+# Cache-Control: a changed file gets a new name, so browsers never need to
+# revalidate. Without a manifest (development), asset_urls() lists the
+# bundle's source files and the static route behaves as before. Rebuild
+# after changing anything under static/; `flask assets clean` goes back to
+# the source files. Old hashed files are kept, so pages rendered before a
+# deploy still load; --prune drops them.
+#
+# rcssmin and rjsmin minify when installed; otherwise CSS gets a
+# conservative comment and whitespace strip and JS is concatenated as is.
+#----------------------------------------------------------------------------#
+
+# bundle name -> source files, in load order
+BUNDLES = {
+  'css/app.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+                  'css/main.quickfix.css'],
+  # loaded synchronously in <head>
+  'js/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+  # deferred, end of <body>
+  'js/app.js': ['js/libs/jquery-1.11.1.min.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js', 'js/script.js'],
+}
+
+DIST = 'dist'
+MANIFEST = posixpath.join(DIST, 'manifest.json')
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg', '.eot', '.ttf', '.otf', '.txt', '.map', '.ico')
+# (Content-Encoding, file suffix), in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SOURCE_MAP = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.M)
+
+
+def _hashed_name(name, content):
+  root, ext = posixpath.splitext(name)
+  return posixpath.join(DIST, '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:12], ext))
+
+def _minify_css(css):
+  if rcssmin is not None:
+    return rcssmin.cssmin(css, keep_bang_comments=True)
+  css = re.sub(r'/\*(?!!).*?\*/', '', css, flags=re.S)
+  css = re.sub(r'\s+', ' ', css)
+  return re.sub(r'\s*([{};,>])\s*', r'\1', css).replace(';}', '}').strip()
+
+def _minify_js(js):
+  # source map comments point at the unbundled file
+  js = SOURCE_MAP.sub('', js)
+  return rjsmin.jsmin(js, keep_bang_comments=True) if rjsmin is not None else js
+
+def _rewrite_css_urls(css, source, target_dir, files, static_url_path):
+  # url()s are relative to the source file; point them at the hashed copies
+  # from the directory the rewritten file is written to
+  def replace(match):
+    quote, url = match.groups()
+    if re.match(r'([a-z][a-z0-9+.-]*:|/|#)', url, re.I):
+      return match.group(0)
+    path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+    if resolved in files:
+      path = posixpath.relpath(files[resolved], target_dir)
+    else:
+      # missing file: keep the address it resolved to before
+      path = '%s/%s' % (static_url_path, resolved)
+    return 'url(%s%s%s%s)' % (quote, path, suffix, quote)
+  return CSS_URL.sub(replace, css)
+
+
+def _write(static_folder, name, content, compressed):
+  # writes dist/<hashed name> and its compressed variants once; returns the hashed name
+  hashed = _hashed_name(name, content)
+  path = os.path.join(static_folder, hashed)
+  variants = []
+  if not os.path.exists(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+      output.write(content)
+  if posixpath.splitext(name)[1].lower() in COMPRESSIBLE:
+    for encoding, suffix in ENCODINGS:
+      if encoding == 'br' and brotli is None:
+        continue
+      if not os.path.exists(path + suffix):
+        packed = brotli.compress(content, quality=11) if encoding == 'br' else gzip.compress(content, 9, mtime=0)
+        # not worth a variant unless it saves something
+        if len(packed) >= len(content):
+          continue
+        with open(path + suffix, 'wb') as output:
+          output.write(packed)
+      variants.append(encoding)
+  if variants:
+    compressed[hashed] = variants
+  return hashed
+
+def build(static_folder, static_url_path, prune=False):
+  # writes the hashed files and the manifest; returns the manifest
+  sources = []
+  for directory, subdirectories, filenames in os.walk(static_folder):
+    relative = os.path.relpath(directory, static_folder).replace(os.sep, '/')
+    if relative == DIST or relative.startswith(DIST + '/'):
+      subdirectories[:] = []
+      continue
+    sources.extend(posixpath.normpath(posixpath.join(relative, filename)) for filename in sorted(filenames))
+
+  def read(name):
+    with open(os.path.join(static_folder, name), 'rb') as source:
+      return source.read()
+
+  files, compressed = {}, {}
+  # CSS last, so the files its url()s point at already have their hashed names
+  for name in sorted(sources, key=lambda name: name.endswith('.css')):
+    content = read(name)
+    if name.endswith('.css'):
+      target_dir = posixpath.join(DIST, posixpath.dirname(name))
+      content = _rewrite_css_urls(content.decode('utf-8'), name, target_dir, files, static_url_path).encode('utf-8')
+    files[name] = _write(static_folder, name, content, compressed)
+
+  for bundle, members in BUNDLES.items():
+    target_dir = posixpath.join(DIST, posixpath.dirname(bundle))
+    parts = [read(member).decode('utf-8') for member in members]
+    if bundle.endswith('.css'):
+      content = _minify_css('\n'.join(_rewrite_css_urls(part, member, target_dir, files, static_url_path)
+                                      for part, member in zip(parts, members)))
+    else:
+      # a statement may end a file without its semicolon
+      content = _minify_js(';\n'.join(parts))
+    files[bundle] = _write(static_folder, bundle, content.encode('utf-8'), compressed)
+
+  manifest = {'files': files, 'compressed': compressed}
+  path = os.path.join(static_folder, MANIFEST)
+  with open(path + '.tmp', 'w') as output:
+    json.dump(manifest, output, indent=1, sort_keys=True)
+  os.replace(path + '.tmp', path)
+  if prune:
+    _prune(static_folder, manifest)
+  return manifest
+
+def _prune(static_folder, manifest):
+  keep = {MANIFEST}
+  for hashed in manifest['files'].values():
+    keep.add(hashed)
+    keep.update(hashed + suffix for _, suffix in ENCODINGS)
+  for directory, _, filenames in os.walk(os.path.join(static_folder, DIST), topdown=False):
+    for filename in filenames:
+      path = os.path.join(directory, filename)
+      if os.path.relpath(path, static_folder).replace(os.sep, '/') not in keep:
+        os.remove(path)
+    if not os.listdir(directory):
+      os.rmdir(directory)
+
+def clean(static_folder):
+  # removes the manifest (and with it the hashed URLs); the files stay for pages already served
+  path = os.path.join(static_folder, MANIFEST)
+  if os.path.exists(path):
+    os.remove(path)
+    return True
+  return False
+
+
+class Assets(object):
+  def __init__(self, app=None):
+    self.manifest = None
+    self._hashed = {}
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.load(app.static_folder)
+    self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    app.url_defaults(self._url_defaults)
+    app.view_functions['static'] = self.send_static
+    app.jinja_env.globals['asset_urls'] = self.urls
+    app.extensions['assets'] = self
+
+  def load(self, static_folder=None):
+    # reads the manifest of static_folder, if built; None serves the source files
+    self.manifest = None
+    if static_folder is not None:
+      try:
+        with open(os.path.join(static_folder, MANIFEST)) as source:
+          self.manifest = json.load(source)
+      except FileNotFoundError:
+        pass
+    files = self.manifest['files'] if self.manifest else {}
+    compressed = self.manifest['compressed'] if self.manifest else {}
+    # hashed name -> encodings available for it
+    self._hashed = {hashed: compressed.get(hashed, ()) for hashed in files.values()}
+
+  def urls(self, bundle):
+    # the bundle, or its source files when nothing has been built
+    if self.manifest and bundle in self.manifest['files']:
+      return [url_for('static', filename=bundle)]
+    return [url_for('static', filename=member) for member in BUNDLES[bundle]]
+
+  def _url_defaults(self, endpoint, values):
+    if endpoint == 'static' and self.manifest:
+      values['filename'] = self.manifest['files'].get(values.get('filename'), values.get('filename'))
+
+  def send_static(self, filename):
+    encodings = self._hashed.get(filename)
+    if encodings is None:
+      return current_app.send_static_file(filename)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+      if encoding in encodings and request.accept_encodings[encoding]:
+        response = send_from_directory(current_app.static_folder, filename + suffix, mimetype=mimetype,
+                                       cache_timeout=self.max_age)
+        response.headers['Content-Encoding'] = encoding
+        break
+    else:
+      response = send_from_directory(current_app.static_folder, filename, mimetype=mimetype, cache_timeout=self.max_age)
+    response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % self.max_age
+    if encodings:
+      response.vary.add('Accept-Encoding')
+    return response
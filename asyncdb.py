@@ -0,0 +1,72 @@
+import re
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine.url import make_url
+
+try:
+  import asyncpg
+except ImportError:
+  asyncpg = None
+
+#----------------------------------------------------------------------------#
+# asyncpg access for the async serving mode (see asgi.py).
+#
+# Statements are the same SQLAlchemy queries the sync loaders build, compiled
+# for Postgres with numbered parameters and sent through an asyncpg pool.
+# Every fetch checks out its own connection, so the statements of one page
+# can run concurrently; size the pool for that (DB_POOL_SIZE plus
+# DB_MAX_OVERFLOW connections per worker, as for the sync engine).
+#----------------------------------------------------------------------------#
+
+_dialect = postgresql.dialect(paramstyle='numeric')
+_numeric_param = re.compile(r'(?<!:):(\d+)')
+
+def compile_statement(statement):
+  # returns (sql, args) in asyncpg's $n style
+  if hasattr(statement, 'statement'):
+    statement = statement.statement
+  compiled = statement.compile(dialect=_dialect)
+  sql = _numeric_param.sub(r'$\1', compiled.string)
+  return sql, [compiled.params[name] for name in compiled.positiontup]
+
+
+class AsyncDatabase(object):
+  def __init__(self, config):
+    if asyncpg is None:
+      raise RuntimeError('the async serving mode needs asyncpg (pip install asyncpg)')
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if not url.drivername.startswith('postgresql'):
+      raise RuntimeError('the async serving mode needs a Postgres DATABASE_URL')
+    url.drivername = 'postgresql'
+    self.dsn = str(url)
+    self.options = {
+      'min_size': config['DB_POOL_SIZE'],
+      'max_size': config['DB_POOL_SIZE'] + config['DB_MAX_OVERFLOW'],
+      'max_inactive_connection_lifetime': config['DB_POOL_RECYCLE'],
+    }
+    if config['DB_PGBOUNCER']:
+      # prepared statements do not survive transaction pooling, and
+      # single-statement fetches have no transaction to SET LOCAL in
+      self.options['statement_cache_size'] = 0
+    elif config['DB_STATEMENT_TIMEOUT_MS']:
+      self.options['server_settings'] = {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}
+    self.pool = None
+
+  async def open(self):
+    if self.pool is None:
+      self.pool = await asyncpg.create_pool(self.dsn, **self.options)
+
+  async def close(self):
+    if self.pool is not None:
+      await self.pool.close()
+      self.pool = None
+
+  async def fetch(self, statement):
+    sql, args = compile_statement(statement)
+    async with self.pool.acquire() as connection:
+      return await connection.fetch(sql, *args)
+
+  async def fetchrow(self, statement):
+    sql, args = compile_statement(statement)
+    async with self.pool.acquire() as connection:
+      return await connection.fetchrow(sql, *args)
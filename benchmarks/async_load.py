@@ -0,0 +1,147 @@
+"""Detail page load: sync WSGI (gunicorn) versus the async mode (uvicorn asgi:application).
+
+Starts each server with the same number of worker processes against the same
+Postgres database, drives /venues/<id> and /artists/<id> from --concurrency
+keep-alive connections for --duration seconds and reports requests/s and
+latency percentiles per mode. Requests carry no If-None-Match, so every one
+runs the page queries; the response cache is disabled.
+
+    pip install gunicorn uvicorn asyncpg
+    python benchmarks/async_load.py --database-url postgresql://localhost/fyyur_bench --seed \\
+        --workers 4 --concurrency 64
+
+--seed overwrites the target database; never point it at real data.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = {
+  'sync_wsgi': ['gunicorn', '--workers', '{workers}', '--bind', '127.0.0.1:{port}', 'app:app'],
+  'async_asgi': ['uvicorn', '--workers', '{workers}', '--port', '{port}', '--no-access-log', 'asgi:application'],
+}
+
+
+async def _get(reader, writer, path):
+  # returns the status and whether the server keeps the connection open
+  writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path).encode('latin-1'))
+  status = int((await reader.readline()).split()[1])
+  length, keep_alive = 0, True
+  while True:
+    line = await reader.readline()
+    if line in (b'\r\n', b''):
+      break
+    name, _, value = line.decode('latin-1').partition(':')
+    if name.lower() == 'content-length':
+      length = int(value)
+    elif name.lower() == 'connection' and value.strip().lower() == 'close':
+      keep_alive = False
+  await reader.readexactly(length)
+  return status, keep_alive
+
+
+async def _client(port, deadline, venues, artists, latencies, errors):
+  # gunicorn's sync workers close every connection, so reconnects are timed too
+  writer = None
+  try:
+    while time.perf_counter() < deadline:
+      path = random.choice(['/venues/%d' % random.randint(1, venues), '/artists/%d' % random.randint(1, artists)])
+      started = time.perf_counter()
+      if writer is None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+      status, keep_alive = await _get(reader, writer, path)
+      latencies.append(time.perf_counter() - started)
+      if status != 200:
+        errors.append((path, status))
+      if not keep_alive:
+        writer.close()
+        writer = None
+  finally:
+    if writer is not None:
+      writer.close()
+
+
+async def drive(port, concurrency, duration, venues, artists):
+  latencies, errors = [], []
+  deadline = time.perf_counter() + duration
+  started = time.perf_counter()
+  await asyncio.gather(*[_client(port, deadline, venues, artists, latencies, errors) for _ in range(concurrency)])
+  elapsed = time.perf_counter() - started
+  latencies.sort()
+  return {
+    'requests': len(latencies),
+    'errors': len(errors),
+    'requests_per_second': len(latencies) / elapsed,
+    'latency_ms': {
+      'p50': latencies[len(latencies) // 2] * 1000,
+      'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+      'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+    },
+  }
+
+
+async def _wait_until_up(port, timeout=30):
+  deadline = time.time() + timeout
+  while time.time() < deadline:
+    try:
+      reader, writer = await asyncio.open_connection('127.0.0.1', port)
+      writer.close()
+      return
+    except OSError:
+      await asyncio.sleep(0.2)
+  raise RuntimeError('server on port %d did not start' % port)
+
+
+def run_mode(name, args, port):
+  command = [part.format(workers=args.workers, port=port) for part in SERVERS[name]]
+  env = dict(os.environ, DATABASE_URL=args.database_url, CACHE_BACKEND='null')
+  server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  try:
+    asyncio.run(_wait_until_up(port))
+    # warm up pools and template caches before measuring
+    asyncio.run(drive(port, args.concurrency, 2, args.venues, args.artists))
+    return asyncio.run(drive(port, args.concurrency, args.duration, args.venues, args.artists))
+  finally:
+    server.terminate()
+    server.wait()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/fyyur_bench'))
+  parser.add_argument('--seed', action='store_true', help='(re)create and seed the database first')
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=2000)
+  parser.add_argument('--shows', type=int, default=50000)
+  parser.add_argument('--workers', type=int, default=4, help='worker processes for both servers')
+  parser.add_argument('--concurrency', type=int, default=64)
+  parser.add_argument('--duration', type=float, default=20.0, help='seconds per mode')
+  parser.add_argument('--port', type=int, default=8765)
+  args = parser.parse_args()
+
+  if args.seed:
+    os.environ['DATABASE_URL'] = args.database_url
+    from app import app
+    from benchmarks.dataset import generate
+    with app.app_context():
+      generate(args.venues, args.artists, args.shows)
+
+  random.seed(0)
+  report = {'workers': args.workers, 'concurrency': args.concurrency}
+  for offset, name in enumerate(SERVERS):
+    report[name] = run_mode(name, args, args.port + offset)
+  report['speedup'] = report['async_asgi']['requests_per_second'] / report['sync_wsgi']['requests_per_second']
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,120 @@
+"""Time to first response of a fresh worker process.
+
+Each run starts a new Python process that imports app.py and requests a
+set of pages once, in order, then once more. Three setups are compared:
+
+  no_cache       no bytecode cache: every template is compiled on first use
+  bytecode_cache `flask templates compile` ran beforehand
+  warmed         bytecode cache, and the process ran warm_up() before the
+                 first measured request (as from a post-fork hook)
+
+Reported per setup (medians over --runs processes): the import time, the
+warm-up time, the first and second response time of each page and their
+sum. The response cache is disabled.
+
+    python -m benchmarks.cold_start --database-url sqlite:///cold_start.db
+
+The target database is overwritten; never point this at real data.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/', '/venues', '/venues/1', '/artists/1', '/shows', '/venues/create', '/api/v1/venues/1']
+
+
+def child(paths, warm):
+  # runs in the fresh process; prints one JSON line
+  started = time.perf_counter()
+  from app import app
+  imported = time.perf_counter()
+  app.config['JOBS_EMBEDDED_WORKER'] = False
+  warmed = imported
+  if warm:
+    from warmup import warm_up
+    warm_up(app)
+    warmed = time.perf_counter()
+  client = app.test_client()
+  timings = {}
+  for attempt in ('first', 'second'):
+    for path in paths:
+      begun = time.perf_counter()
+      response = client.get(path)
+      response.get_data()
+      response.close()
+      timings.setdefault(path, {})[attempt] = (time.perf_counter() - begun) * 1000
+  json.dump({'import_ms': (imported - started) * 1000, 'warm_up_ms': (warmed - imported) * 1000,
+             'pages': timings}, sys.stdout)
+
+
+def spawn(env, *arguments):
+  output = subprocess.check_output([sys.executable, '-W', 'ignore', '-m', 'benchmarks.cold_start'] + list(arguments),
+                                   cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+  return json.loads(output.decode().strip().splitlines()[-1]) if output.strip() else None
+
+def setup_report(runs):
+  pages = {path: {attempt: statistics.median(run['pages'][path][attempt] for run in runs)
+                  for attempt in ('first', 'second')} for path in runs[0]['pages']}
+  return {'import_ms': statistics.median(run['import_ms'] for run in runs),
+          'warm_up_ms': statistics.median(run['warm_up_ms'] for run in runs),
+          'first_responses_ms': sum(page['first'] for page in pages.values()),
+          'second_responses_ms': sum(page['second'] for page in pages.values()),
+          'pages': pages}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default='sqlite:///cold_start.db')
+  parser.add_argument('--runs', type=int, default=5, help='processes per setup')
+  parser.add_argument('--paths', nargs='+', default=PATHS)
+  parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+  parser.add_argument('--warm', action='store_true', help=argparse.SUPPRESS)
+  parser.add_argument('--compile', action='store_true', help=argparse.SUPPRESS)
+  args = parser.parse_args()
+  if args.child:
+    if args.compile:
+      from app import app
+      from warmup import precompile_templates
+      precompile_templates(app)
+    else:
+      child(args.paths, args.warm)
+    return
+
+  env = dict(os.environ, DATABASE_URL=args.database_url, CACHE_BACKEND='null', SLOW_REQUEST_MS='0',
+             SLOW_QUERY_MS='0')
+  from app import app
+  from benchmarks.dataset import generate
+  app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+  with app.app_context():
+    generate(200, 500, 5000)
+
+  cache_dir = tempfile.mkdtemp(prefix='fyyur-template-cache-')
+  report = {'runs': args.runs, 'paths': args.paths, 'setups': {}}
+  try:
+    setups = (('no_cache', dict(env, TEMPLATE_CACHE_DIR=''), []),
+              ('bytecode_cache', dict(env, TEMPLATE_CACHE_DIR=cache_dir), []),
+              ('warmed', dict(env, TEMPLATE_CACHE_DIR=cache_dir), ['--warm']))
+    spawn(setups[1][1], '--child', '--compile')
+    for name, setup_env, flags in setups:
+      runs = [spawn(setup_env, '--child', '--paths', *args.paths, *flags) for _ in range(args.runs)]
+      report['setups'][name] = setup_report(runs)
+      result = report['setups'][name]
+      print('%-15s import %7.1f ms  warm-up %7.1f ms  first responses %7.1f ms  second responses %6.1f ms' % (
+        name, result['import_ms'], result['warm_up_ms'], result['first_responses_ms'],
+        result['second_responses_ms']), file=sys.stderr)
+  finally:
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
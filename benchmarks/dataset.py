@@ -0,0 +1,185 @@
+"""Synthetic Fyyur catalog for benchmarks.
+
+Generates venues, artists, genre tags and shows with a lopsided, roughly
+real-world shape: a few cities, genres, venues and artists account for most
+of the rows, and shows cluster on weekend evenings over the past year and
+the next six months. The same --seed gives the same catalog (start times are
+relative to --now, today's midnight by default).
+
+    python -m benchmarks.dataset --database-url sqlite:///bench.db --venues 2000 --artists 5000 --shows 200000
+
+The target database is overwritten; never point this at real data.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+
+from app import app
+from config import db
+from forms import VenueForm
+from lookups import area_ids, genre_ids
+from models import *
+from stats import rebuild_venue_stats
+
+GENRES = [value for value, label in VenueForm.genres.kwargs['choices']]
+
+# (city, state, relative weight)
+CITIES = (
+  ('New York', 'NY', 30), ('Los Angeles', 'CA', 22), ('Chicago', 'IL', 14), ('Nashville', 'TN', 12),
+  ('Austin', 'TX', 11), ('San Francisco', 'CA', 10), ('Seattle', 'WA', 8), ('New Orleans', 'LA', 8),
+  ('Atlanta', 'GA', 7), ('Boston', 'MA', 7), ('Denver', 'CO', 6), ('Philadelphia', 'PA', 6),
+  ('Portland', 'OR', 5), ('Minneapolis', 'MN', 4), ('Detroit', 'MI', 4), ('Memphis', 'TN', 4),
+  ('Miami', 'FL', 4), ('Kansas City', 'MO', 3), ('Pittsburgh', 'PA', 3), ('Asheville', 'NC', 2),
+  ('Athens', 'GA', 2), ('Burlington', 'VT', 1), ('Missoula', 'MT', 1), ('Bozeman', 'MT', 1),
+)
+ADJECTIVES = ('Blue', 'Velvet', 'Golden', 'Electric', 'Midnight', 'Silver', 'Wild', 'Crimson', 'Lucky', 'Hollow',
+              'Neon', 'Rusty', 'Little', 'Grand', 'Broken', 'Northern', 'Royal', 'Painted', 'Lonesome', 'Sweet')
+NOUNS = ('Owl', 'Anchor', 'Lantern', 'Fox', 'Harbor', 'Crow', 'Garden', 'Engine', 'Canyon', 'Rose',
+         'Mirror', 'River', 'Coyote', 'Station', 'Tiger', 'Orchard', 'Comet', 'Saint', 'Willow', 'Ghost')
+VENUE_KINDS = ('Hall', 'Room', 'Lounge', 'Theatre', 'Tavern', 'Club', 'Ballroom', 'Music Hall', 'Social', 'Bar')
+ARTIST_KINDS = ('Band', 'Trio', 'Quartet', 'Collective', 'Orchestra', 'Brothers', 'Revival', 'Sisters', 'Project', '')
+STREETS = ('Main St', 'Broadway', 'Market St', 'Mission St', 'Elm St', '2nd Ave', 'Union St', 'Oak St', 'Canal St')
+
+# show lengths, and relative number of shows by weekday (Monday first) and by start time
+WEEKDAY_WEIGHTS = (0.5, 0.6, 0.8, 1.0, 1.7, 1.9, 0.9)
+SHOW_MINUTES = (90, 120, 120, 150, 180, 180, 240)
+START_TIMES = (((13, 0), 1), ((15, 0), 1), ((17, 0), 2), ((18, 30), 3), ((19, 0), 8), ((19, 30), 7),
+               ((20, 0), 10), ((20, 30), 6), ((21, 0), 8), ((22, 0), 5), ((23, 0), 2))
+
+
+def _weights(rng, count, shape=1.2):
+  # heavy-tailed popularity, so a few rows dominate as they do in real catalogs
+  return list(itertools.accumulate(rng.paretovariate(shape) for _ in range(count)))
+
+def _pick_genres(rng, weights):
+  count = rng.choice((1, 1, 2, 2, 2, 3))
+  picked = set()
+  while len(picked) < count:
+    picked.add(rng.choices(GENRES, cum_weights=weights)[0])
+  return picked
+
+def _name(rng, kinds):
+  return ' '.join(part for part in ('The', rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(kinds)) if part)
+
+def _phone(rng):
+  return '%03d-%03d-%04d' % (rng.randint(201, 989), rng.randint(200, 999), rng.randint(0, 9999))
+
+def start_times(rng, count, now, past_days=365, future_days=180):
+  # weekday-weighted days around now, evening-heavy start times
+  top = max(WEEKDAY_WEIGHTS)
+  times, weights = zip(*START_TIMES)
+  cum_weights = list(itertools.accumulate(weights))
+  result = []
+  while len(result) < count:
+    day = now + datetime.timedelta(days=rng.randint(-past_days, future_days))
+    if rng.random() * top > WEEKDAY_WEIGHTS[day.weekday()]:
+      continue
+    hour, minute = rng.choices(times, cum_weights=cum_weights)[0]
+    result.append(day.replace(hour=hour, minute=minute, second=0, microsecond=0))
+  return result
+
+
+def _clip_overlaps(rows, owner):
+  # popular venues and artists draw more shows than fit; end each show no
+  # later than the next one of the same owner starts, as the Postgres
+  # exclusion constraints require (same-time duplicates become empty)
+  rows = sorted(rows, key=lambda row: (row[owner], row['start_time']))
+  for row, following in zip(rows, rows[1:]):
+    if row[owner] == following[owner] and row['end_time'] > following['start_time']:
+      row['end_time'] = following['start_time']
+
+
+def generate(venues, artists, shows, seed=0, now=None, batch_size=10000, past_days=365, future_days=180):
+  # (re)creates every table and fills it; venue ids are 1..venues and
+  # artist ids 1..artists. Returns a summary of what was generated.
+  rng = random.Random(seed)
+  now = now or datetime.datetime.combine(datetime.date.today(), datetime.time())
+  db.drop_all()
+  db.create_all()
+
+  cities = [(city, state) for city, state, _ in CITIES]
+  city_weights = list(itertools.accumulate(weight for _, _, weight in CITIES))
+  genre_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(GENRES))))
+  areas = area_ids(cities)
+  genres = genre_ids(GENRES)
+
+  venue_rows, venue_tags = [], []
+  for venue_id in range(1, venues + 1):
+    city, state = rng.choices(cities, cum_weights=city_weights)[0]
+    seeking = rng.random() < 0.3
+    venue_rows.append({
+      'id': venue_id, 'name': _name(rng, VENUE_KINDS), 'address': '%d %s' % (rng.randint(1, 4000), rng.choice(STREETS)),
+      'city': city, 'state': state, 'area_id': areas[(city, state)], 'phone': _phone(rng),
+      'website': 'https://venue%d.example.com' % venue_id if rng.random() < 0.6 else None,
+      'facebook_link': 'https://www.facebook.com/venue%d' % venue_id if rng.random() < 0.7 else None,
+      'seeking_talent': seeking, 'seeking_description': 'Booking local acts most weeknights.' if seeking else None,
+      'image_link': 'https://images.example.com/venues/%d.jpg' % venue_id if rng.random() < 0.8 else None,
+    })
+    venue_tags.extend({'venue_id': venue_id, 'genre_id': genres[genre]} for genre in _pick_genres(rng, genre_weights))
+
+  artist_rows, artist_tags = [], []
+  for artist_id in range(1, artists + 1):
+    city, state = rng.choices(cities, cum_weights=city_weights)[0]
+    seeking = rng.random() < 0.4
+    artist_rows.append({
+      'id': artist_id, 'name': _name(rng, ARTIST_KINDS), 'city': city, 'state': state, 'phone': _phone(rng),
+      'website': 'https://artist%d.example.com' % artist_id if rng.random() < 0.5 else None,
+      'facebook_link': 'https://www.facebook.com/artist%d' % artist_id if rng.random() < 0.7 else None,
+      'seeking_venue': seeking, 'seeking_description': 'Looking for weekend slots.' if seeking else None,
+      'image_link': 'https://images.example.com/artists/%d.jpg' % artist_id if rng.random() < 0.8 else None,
+    })
+    artist_tags.extend({'artist_id': artist_id, 'genre_id': genres[genre]} for genre in _pick_genres(rng, genre_weights))
+
+  for table, rows in ((Venue.__table__, venue_rows), (GenreTagsForVenues.__table__, venue_tags),
+                      (Artist.__table__, artist_rows), (GenreTagsForArtists.__table__, artist_tags)):
+    for start in range(0, len(rows), batch_size):
+      db.session.execute(table.insert(), rows[start:start + batch_size])
+  if db.session.get_bind().dialect.name == 'postgresql':
+    # explicit ids do not advance the serial sequences the app inserts with
+    for table, count in (('venue', venues), ('artist', artists)):
+      db.session.execute("SELECT setval(pg_get_serial_sequence('%s', 'id'), %d)" % (table, max(count, 1)))
+
+  venue_weights = _weights(rng, venues)
+  artist_weights = _weights(rng, artists)
+  times = start_times(rng, shows, now, past_days, future_days)
+  show_rows = [
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time,
+     'end_time': start_time + datetime.timedelta(minutes=rng.choice(SHOW_MINUTES))}
+    for venue_id, artist_id, start_time in zip(rng.choices(range(1, venues + 1), cum_weights=venue_weights, k=shows),
+                                               rng.choices(range(1, artists + 1), cum_weights=artist_weights, k=shows), times)]
+  _clip_overlaps(show_rows, 'venue_id')
+  _clip_overlaps(show_rows, 'artist_id')
+  for start in range(0, shows, batch_size):
+    db.session.execute(Show.__table__.insert(), show_rows[start:start + batch_size])
+  upcoming = sum(1 for start_time in times if start_time > now)
+
+  rebuild_venue_stats()
+  db.session.commit()
+  return {'seed': seed, 'venues': venues, 'artists': artists, 'shows': shows, 'upcoming_shows': upcoming,
+          'venue_tags': len(venue_tags), 'artist_tags': len(artist_tags), 'areas': len(areas),
+          'genres': len(genres), 'now': now.isoformat()}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'sqlite:///bench.db'))
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=200000)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--now', type=datetime.datetime.fromisoformat, help='anchor for start times (default today 00:00)')
+  args = parser.parse_args()
+
+  app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+  with app.app_context():
+    summary = generate(args.venues, args.artists, args.shows, args.seed, args.now)
+  json.dump(summary, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
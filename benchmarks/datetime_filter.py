@@ -0,0 +1,56 @@
+"""Per-tile cost of the `datetime` Jinja filter, before and after.
+
+"before" is the original filter fed str(start_time): dateutil parse plus a
+full babel.dates.format_datetime call. "after" is views.pages.format_datetime
+fed the datetime object the views now pass.
+
+    python benchmarks/datetime_filter.py --tiles 5000
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+
+from views.pages import format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--tiles', type=int, default=5000, help='tiles rendered per page')
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+
+  start = datetime.datetime(2035, 4, 1, 20, 0)
+  times = [start + datetime.timedelta(hours=i) for i in range(args.tiles)]
+  strings = [str(value) for value in times]
+  assert all(legacy_format_datetime(s, 'full') == format_datetime(t, 'full') for s, t in zip(strings, times))
+
+  before = min(timeit.repeat(lambda: [legacy_format_datetime(s, 'full') for s in strings], number=1, repeat=args.repeat))
+  after = min(timeit.repeat(lambda: [format_datetime(t, 'full') for t in times], number=1, repeat=args.repeat))
+  json.dump({
+    'tiles': args.tiles,
+    'before_us_per_tile': before / args.tiles * 1e6,
+    'after_us_per_tile': after / args.tiles * 1e6,
+    'speedup': before / after,
+  }, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
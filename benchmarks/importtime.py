@@ -0,0 +1,154 @@
+"""Import and start-up time of the app's entry points.
+
+Each entry point runs in fresh processes under `python -X importtime`:
+
+  import_app   `import app`, as a WSGI server worker does
+  flask_db     `flask db current`
+  jobs_worker  `flask jobs work --once` on an empty queue
+  worker_py    `python worker.py --once`, the same without the flask command
+  forked       a worker forked from a master that imported the app and ran
+               warmup.preload (gunicorn.conf.py), up to its first response
+
+Reported per entry point (medians over --runs processes): wall time, the
+time spent importing, the heaviest modules imported directly by the entry
+point and which of the lazily loaded packages were imported. --tree
+measures another checkout of the repository (e.g. one extracted with
+`git archive`) for comparison.
+
+    python -m benchmarks.importtime --database-url sqlite:///importtime.db
+
+The target database is overwritten; never point this at real data.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# packages app.py is meant to load only when needed
+LAZY = ('alembic', 'flask_migrate', 'flask_moment', 'distutils', 'wtforms', 'babel', 'dateutil')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+ENTRY_POINTS = {
+  'import_app': ['-c', 'import app'],
+  'flask_db': ['-m', 'flask', 'db', 'current'],
+  'jobs_worker': ['-m', 'flask', 'jobs', 'work', '--once'],
+  'worker_py': ['worker.py', '--once'],
+}
+
+
+def parse_importtime(stderr):
+  # top-level imports (cumulative microseconds) and every module name seen
+  top, modules = {}, set()
+  for line in stderr.splitlines():
+    match = IMPORT_LINE.match(line)
+    if match is None:
+      continue
+    _, cumulative, indent, name = match.groups()
+    modules.add(name.split('.')[0])
+    if len(indent) == 1:
+      top[name] = top.get(name, 0) + int(cumulative)
+  return top, modules
+
+def run(tree, env, arguments):
+  started = time.perf_counter()
+  process = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore'] + arguments, cwd=tree, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+  elapsed = (time.perf_counter() - started) * 1000
+  if process.returncode:
+    raise RuntimeError('%s failed:\n%s' % (' '.join(arguments), process.stderr[-2000:]))
+  top, modules = parse_importtime(process.stderr)
+  return {'wall_ms': elapsed, 'import_ms': sum(top.values()) / 1000.0, 'top': top, 'modules': modules}
+
+def forked(runs, path):
+  # runs in the master process: preloads once, then times each forked worker to its first response
+  started = time.perf_counter()
+  from app import app
+  from warmup import preload, after_fork
+  app.config['JOBS_EMBEDDED_WORKER'] = False
+  preload(app)
+  master_ms = (time.perf_counter() - started) * 1000
+  timings = []
+  for _ in range(runs):
+    reader, writer = os.pipe()
+    forked_at = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+      os.close(reader)
+      after_fork(app)
+      response = app.test_client().get(path)
+      response.get_data()
+      os.write(writer, json.dumps([(time.perf_counter() - forked_at) * 1000, response.status_code]).encode())
+      os._exit(0)
+    os.close(writer)
+    with os.fdopen(reader) as result:
+      elapsed, status = json.loads(result.read())
+    os.waitpid(pid, 0)
+    if status != 200:
+      raise RuntimeError('%s answered %d in the forked worker' % (path, status))
+    timings.append(elapsed)
+  return {'master_ms': master_ms, 'first_response_ms': statistics.median(timings)}
+
+
+def summarize(samples, top_n):
+  totals = {}
+  for sample in samples:
+    for name, cumulative in sample['top'].items():
+      totals.setdefault(name, []).append(cumulative / 1000.0)
+  heaviest = sorted(((statistics.median(values), name) for name, values in totals.items()), reverse=True)[:top_n]
+  return {'wall_ms': statistics.median(sample['wall_ms'] for sample in samples),
+          'import_ms': statistics.median(sample['import_ms'] for sample in samples),
+          'heaviest_imports_ms': {name: value for value, name in heaviest},
+          'lazy_packages_imported': sorted(set(LAZY) & samples[0]['modules'])}
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default='sqlite:///importtime.db')
+  parser.add_argument('--runs', type=int, default=5, help='processes per entry point')
+  parser.add_argument('--top', type=int, default=8, help='heaviest imports listed per entry point')
+  parser.add_argument('--tree', default=ROOT, help='checkout to measure (default: this one)')
+  parser.add_argument('--path', default='/shows/create', help='page requested by the forked workers')
+  parser.add_argument('--forked', action='store_true', help=argparse.SUPPRESS)
+  args = parser.parse_args()
+  if args.forked:
+    json.dump(forked(args.runs, args.path), sys.stdout)
+    return
+
+  tree = os.path.abspath(args.tree)
+  env = dict(os.environ, DATABASE_URL=args.database_url, CACHE_BACKEND='null', FLASK_APP='app.py',
+             JOBS_EMBEDDED_WORKER='0', TEMPLATE_CACHE_DIR='', PYTHONPATH=tree)
+  # the schema of this checkout; the job table is all the entry points touch
+  os.environ.update(DATABASE_URL=args.database_url, CACHE_BACKEND='null')
+  from app import app
+  from config import db
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+  report = {'tree': tree, 'runs': args.runs, 'entry_points': {}}
+  for name, arguments in ENTRY_POINTS.items():
+    if arguments[0].endswith('.py') and not os.path.exists(os.path.join(tree, arguments[0])):
+      continue
+    result = report['entry_points'][name] = summarize([run(tree, env, arguments) for _ in range(args.runs)], args.top)
+    print('%-12s wall %7.1f ms  imports %7.1f ms  lazy packages imported: %s' % (
+      name, result['wall_ms'], result['import_ms'], ', '.join(result['lazy_packages_imported']) or '-'),
+      file=sys.stderr)
+
+  if os.path.exists(os.path.join(tree, 'gunicorn.conf.py')):
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-m', 'benchmarks.importtime', '--forked',
+                                      '--runs', str(args.runs), '--path', args.path],
+                                     cwd=tree, env=env, stderr=subprocess.DEVNULL)
+    result = report['entry_points']['forked'] = json.loads(output.decode())
+    print('%-12s master preload %7.1f ms  forked worker first response %6.1f ms' % (
+      'forked', result['master_ms'], result['first_response_ms']), file=sys.stderr)
+
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
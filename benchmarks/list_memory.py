@@ -0,0 +1,127 @@
+"""Memory per request of the list and detail loaders: ORM entities versus row tuples.
+
+"entities" loads full Venue/Artist/Show objects with every column, as the
+views originally did; "rows" is the current loader in queries.py, which
+selects only the rendered columns and returns row tuples. For each case the
+tracemalloc peak, the memory and gc-tracked objects still held after the
+result is dropped (with the session open) and the wall time are reported,
+followed by the peak of whole requests through the test client.
+
+    python -m benchmarks.list_memory --database-url sqlite:///memory_bench.db --artists 20000
+
+The target database is overwritten; never point this at real data.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('CACHE_BACKEND', 'null')
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, undefer_group
+
+from app import app
+from benchmarks.dataset import generate
+from config import db
+from models import *
+from queries import artist_list, shows_page, show_data, venue_detail, venue_page, venue_shows
+
+
+def entity_artists():
+  return [{'id': artist.id, 'name': artist.name}
+          for artist in db.session.query(Artist).options(undefer_group('profile'))]
+
+def row_artists():
+  return [{'id': row.id, 'name': row.name} for row in artist_list()]
+
+def entity_shows(page_size):
+  shows = db.session.query(Show).options(joinedload(Show.venue).undefer_group('profile'),
+                                         joinedload(Show.artist).undefer_group('profile')).order_by(
+    Show.start_time, Show.id).limit(page_size)
+  return [{'venue_id': show.venue_id, 'venue_name': show.venue.name, 'artist_id': show.artist_id,
+           'artist_name': show.artist.name, 'artist_image_link': show.artist.image_link,
+           'start_time': show.start_time, 'end_time': show.end_time} for show in shows]
+
+def row_shows(page_size):
+  return [show_data(row) for row in shows_page(page_size=page_size)[0]]
+
+def entity_venue(venue_id):
+  venue = db.session.query(Venue).options(undefer_group('profile'), joinedload(Venue.genres)).get(venue_id)
+  return venue_page(venue, [tag.genre.name for tag in venue.genres], venue_shows(venue_id))
+
+def row_venue(venue_id):
+  return venue_detail(venue_id)
+
+
+def measure(function, *args):
+  # retained is measured before the session is removed
+  db.session.remove()
+  gc.collect()
+  objects = len(gc.get_objects())
+  tracemalloc.start()
+  baseline = tracemalloc.get_traced_memory()[0]
+  started = time.perf_counter()
+  result = function(*args)
+  elapsed = time.perf_counter() - started
+  del result
+  gc.collect()
+  current, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  report = {'peak_kib': (peak - baseline) / 1024, 'retained_kib': (current - baseline) / 1024,
+            'objects_retained': len(gc.get_objects()) - objects, 'ms': elapsed * 1000}
+  db.session.remove()
+  return report
+
+def measure_request(client, path):
+  client.get(path).get_data()
+  gc.collect()
+  tracemalloc.start()
+  baseline = tracemalloc.get_traced_memory()[0]
+  started = time.perf_counter()
+  response = client.get(path)
+  size = len(response.get_data())
+  response.close()
+  elapsed = time.perf_counter() - started
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return {'status': response.status_code, 'bytes': size, 'peak_kib': (peak - baseline) / 1024, 'ms': elapsed * 1000}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default='sqlite:///memory_bench.db')
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=20000)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--page-size', type=int, default=1000, help='shows per page for the show loaders')
+  args = parser.parse_args()
+
+  app.config.update(SQLALCHEMY_DATABASE_URI=args.database_url, SLOW_REQUEST_MS=0, SLOW_QUERY_MS=0,
+                    SHOWS_MAX_PAGE_SIZE=max(args.page_size, app.config['SHOWS_MAX_PAGE_SIZE']))
+  report = {'venues': args.venues, 'artists': args.artists, 'shows': args.shows, 'loaders': {}}
+  with app.app_context():
+    generate(args.venues, args.artists, args.shows)
+    report['database'] = db.get_engine().dialect.name
+    busiest = db.session.query(Show.venue_id).group_by(Show.venue_id).order_by(func.count(Show.id).desc()).first()[0]
+    cases = {
+      'artists': ((entity_artists,), (row_artists,)),
+      'shows_page': ((entity_shows, args.page_size), (row_shows, args.page_size)),
+      'busiest_venue': ((entity_venue, busiest), (row_venue, busiest)),
+    }
+    for name, (entities, rows) in cases.items():
+      report['loaders'][name] = {'entities': measure(*entities), 'rows': measure(*rows)}
+
+  client = app.test_client()
+  report['requests'] = {path: measure_request(client, path) for path in (
+    '/artists', '/api/v1/artists?limit=100', '/shows?limit=%d' % args.page_size, '/venues/%d' % busiest)}
+
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,85 @@
+"""Static asset weight of a page: source files versus the built bundles.
+
+Loads each page through the Flask test client with a browser's
+Accept-Encoding, then every local stylesheet, script and icon it references,
+and reports the requests and bytes of a first visit and of a repeat visit
+--revisit-after seconds later (assets whose cache lifetime has run out are
+requested again, as conditional requests). "sources" serves static/ as
+written; "built" runs `flask assets build` first and uses its manifest.
+
+    python -m benchmarks.page_weight --database-url sqlite:///page_weight.db
+
+The target database is overwritten; never point this at real data.
+Writes static/dist/, as `flask assets build` does.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+os.environ.setdefault('CACHE_BACKEND', 'null')
+
+from app import app
+from assets import build
+from benchmarks.dataset import generate
+from config import assets
+
+ASSET = re.compile(r'<(?:link|script)\b[^>]*?(?:href|src)="([^"]+)"')
+MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def visit(client, path, accept_encoding, revisit_after):
+  page = client.get(path).get_data(as_text=True)
+  urls = sorted({url for url in ASSET.findall(page) if url.startswith(app.static_url_path + '/')})
+  first = {'requests': 0, 'bytes': 0, 'missing': 0}
+  repeat = {'requests': 0, 'bytes': 0}
+  for url in urls:
+    response = client.get(url, headers={'Accept-Encoding': accept_encoding})
+    if response.status_code == 404:
+      first['missing'] += 1
+      continue
+    first['requests'] += 1
+    first['bytes'] += len(response.get_data())
+    cache_control = response.headers.get('Cache-Control', '')
+    max_age = MAX_AGE.search(cache_control)
+    if 'immutable' in cache_control or (max_age and int(max_age.group(1)) > revisit_after):
+      continue
+    revalidated = client.get(url, headers={'Accept-Encoding': accept_encoding,
+                                           'If-None-Match': response.headers.get('ETag', '')})
+    repeat['requests'] += 1
+    repeat['bytes'] += len(revalidated.get_data())
+  return {'assets': urls, 'first_visit': first, 'repeat_visit': repeat}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default='sqlite:///page_weight.db')
+  parser.add_argument('--accept-encoding', default='gzip, deflate, br')
+  parser.add_argument('--revisit-after', type=int, default=24 * 3600, help='seconds between the two visits')
+  parser.add_argument('--paths', nargs='+', default=['/', '/venues', '/venues/1', '/shows/create'])
+  args = parser.parse_args()
+
+  app.config.update(SQLALCHEMY_DATABASE_URI=args.database_url, JOBS_EMBEDDED_WORKER=False)
+  with app.app_context():
+    generate(20, 20, 200)
+  client = app.test_client()
+  report = {'accept_encoding': args.accept_encoding, 'revisit_after': args.revisit_after, 'modes': {}}
+  for mode in ('sources', 'built'):
+    if mode == 'built':
+      build(app.static_folder, app.static_url_path)
+      assets.load(app.static_folder)
+    else:
+      assets.load(None)
+    report['modes'][mode] = {path: visit(client, path, args.accept_encoding, args.revisit_after) for path in args.paths}
+    for path, result in report['modes'][mode].items():
+      print('%-8s %-14s first visit %2d requests %8d bytes   repeat visit %2d requests %7d bytes' % (
+        mode, path, result['first_visit']['requests'], result['first_visit']['bytes'],
+        result['repeat_visit']['requests'], result['repeat_visit']['bytes']), file=sys.stderr)
+
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
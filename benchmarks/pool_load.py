@@ -0,0 +1,101 @@
+"""Throughput of the read routes at a fixed connection budget.
+
+Drives the app in-process from --concurrency threads through the Flask test
+client against a real database, with the response cache disabled, and
+reports requests/s, latency percentiles and the pool checkout metrics.
+Pool settings come from the usual DB_* environment variables, e.g.
+
+    DB_POOL_SIZE=4 DB_MAX_OVERFLOW=0 python benchmarks/pool_load.py \\
+        --database-url postgresql://localhost/fyyur_bench --seed --concurrency 32
+
+Pool metrics are only collected for Postgres. --seed overwrites the target
+database; never point it at real data.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault('CACHE_BACKEND', 'null')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config import db
+from dbpool import pool_stats
+from benchmarks.dataset import generate
+
+
+def run(concurrency, requests_per_thread, venues, artists):
+  latencies = []
+  errors = []
+  lock = threading.Lock()
+
+  def worker():
+    client = app.test_client()
+    mine = []
+    for _ in range(requests_per_thread):
+      path = random.choice(['/venues/%d' % random.randint(1, venues), '/artists/%d' % random.randint(1, artists),
+                            '/shows?window=upcoming'])
+      started = time.perf_counter()
+      response = client.get(path)
+      mine.append(time.perf_counter() - started)
+      if response.status_code != 200:
+        errors.append((path, response.status_code))
+    with lock:
+      latencies.extend(mine)
+
+  threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - started
+
+  latencies.sort()
+  return {
+    'requests': len(latencies),
+    'errors': len(errors),
+    'requests_per_second': len(latencies) / elapsed,
+    'latency_ms': {
+      'p50': latencies[len(latencies) // 2] * 1000,
+      'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+      'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+    },
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'sqlite:///pool_load_bench.db'))
+  parser.add_argument('--seed', action='store_true', help='(re)create and seed the database first')
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=2000)
+  parser.add_argument('--shows', type=int, default=50000)
+  parser.add_argument('--concurrency', type=int, default=16)
+  parser.add_argument('--requests', type=int, default=100, help='requests per thread')
+  args = parser.parse_args()
+
+  app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+  app.config['ENFORCE_QUERY_BUDGET'] = False
+  random.seed(0)
+  with app.app_context():
+    if args.seed:
+      generate(args.venues, args.artists, args.shows)
+    db.session.remove()
+    report = run(args.concurrency, args.requests, args.venues, args.artists)
+    report.update({
+      'database': db.get_engine().dialect.name,
+      'concurrency': args.concurrency,
+      'connection_budget': app.config['DB_POOL_SIZE'] + app.config['DB_MAX_OVERFLOW'],
+      'pool': pool_stats(db.get_engine()),
+    })
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,103 @@
+"""Measure the show(venue_id, start_time) / show(artist_id, start_time) indexes.
+
+Generates a synthetic catalog (benchmarks/dataset.py), then records EXPLAIN
+plans and timings of the hot show lookups with the composite indexes dropped
+and again with them created.
+
+    python benchmarks/show_indexes.py --database-url sqlite:///bench.db --shows 200000
+
+The target database is overwritten; never point this at real data.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config import db
+from models import *
+from sqlalchemy import func
+from stats import refresh_venue_stats
+from benchmarks.dataset import generate
+
+INDEX_NAMES = ('ix_show_venue_id_start_time', 'ix_show_artist_id_start_time')
+
+
+def hot_queries(venue_id, artist_id):
+  now = datetime.datetime.now()
+  return {
+    'venue_shows': db.session.query(Artist.id, Artist.name, Artist.image_link, Show.start_time).join(
+      Show, Show.artist_id == Artist.id).filter(Show.venue_id == venue_id).order_by(Show.start_time),
+    'artist_shows': db.session.query(Venue.id, Venue.name, Venue.image_link, Show.start_time).join(
+      Show, Show.venue_id == Venue.id).filter(Show.artist_id == artist_id).order_by(Show.start_time),
+    'venue_upcoming_count': db.session.query(func.count(Show.id)).filter(
+      Show.venue_id == venue_id, Show.start_time > now),
+  }
+
+
+def explain(query):
+  dialect = db.session.get_bind().dialect
+  compiled = query.statement.compile(dialect=dialect)
+  prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN ANALYZE '
+  params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional else compiled.params
+  return [' '.join(str(column) for column in row) for row in db.session.connection().execute(prefix + str(compiled), params)]
+
+
+def measure(label, samples, venues, artists):
+  ids = [(random.randint(1, venues), random.randint(1, artists)) for _ in range(samples)]
+  report = {'plans': {name: explain(query) for name, query in hot_queries(*ids[0]).items()}, 'timings_ms': {}}
+  for name in hot_queries(1, 1):
+    elapsed = []
+    for venue_id, artist_id in ids:
+      started = time.perf_counter()
+      hot_queries(venue_id, artist_id)[name].all()
+      elapsed.append((time.perf_counter() - started) * 1000)
+    elapsed.sort()
+    report['timings_ms'][name] = {'mean': sum(elapsed) / len(elapsed), 'p50': elapsed[len(elapsed) // 2],
+                                  'p99': elapsed[int(len(elapsed) * 0.99)]}
+  started = time.perf_counter()
+  refresh_venue_stats([venue_id for venue_id, _ in ids])
+  report['timings_ms']['refresh_venue_stats'] = (time.perf_counter() - started) * 1000
+  db.session.rollback()
+  print(label, json.dumps(report['timings_ms'], indent=2), file=sys.stderr)
+  return report
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default='sqlite:///show_indexes_bench.db')
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=200000)
+  parser.add_argument('--samples', type=int, default=200)
+  parser.add_argument('--output', default='-', help='file for the JSON report (default stdout)')
+  args = parser.parse_args()
+
+  app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+  random.seed(0)
+  with app.app_context():
+    generate(args.venues, args.artists, args.shows)
+    indexes = [index for index in Show.__table__.indexes if index.name in INDEX_NAMES]
+    engine = db.get_engine()
+
+    for index in indexes:
+      index.drop(engine)
+    before = measure('before', args.samples, args.venues, args.artists)
+    for index in indexes:
+      index.create(engine)
+    after = measure('after', args.samples, args.venues, args.artists)
+    report = {'database': engine.dialect.name, 'venues': args.venues, 'artists': args.artists,
+              'shows': args.shows, 'before': before, 'after': after}
+
+  output = sys.stdout if args.output == '-' else open(args.output, 'w')
+  json.dump(report, output, indent=2, default=str)
+  output.write('\n')
+
+
+if __name__ == '__main__':
+  main()
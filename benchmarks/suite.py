@@ -0,0 +1,306 @@
+"""Per-endpoint benchmark of every Fyyur route.
+
+`run` generates a synthetic catalog (benchmarks/dataset.py), drives every
+route of the app through the Flask test client and reports, per scenario,
+requests/s, latency percentiles and SQL statements per request as JSON,
+tagged with the current commit. `compare` diffs two reports and exits 1 when
+a scenario got slower than --threshold or issues more statements.
+
+    python -m benchmarks.suite run --database-url sqlite:///suite_bench.db --output before.json
+    git checkout my-branch
+    python -m benchmarks.suite run --database-url sqlite:///suite_bench.db --output after.json
+    python -m benchmarks.suite compare before.json after.json
+
+Reads run first, then the form submissions, then one worker drains the
+jobs they queued (reported under "jobs"), then deletes of the venues the
+suite created. Responses are uncached and requests carry no If-None-Match,
+so every request does its full work. With --replica-database-url the same
+catalog is generated there too and the read-only views read it as a
+replica (routing.py); "replica_statements" counts what it served. The
+target databases are overwritten; never point this at real data.
+"""
+import argparse
+import collections
+import datetime
+import html
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('CACHE_BACKEND', 'null')
+
+from sqlalchemy import event
+
+from app import app
+from benchmarks.dataset import ADJECTIVES, CITIES, GENRES, NOUNS, generate
+from config import db, replicas
+from jobs import work
+from models import *
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAILED_FORM = re.compile(rb'An error occured|could not be listed')
+
+# name, method, endpoint, expected status, request builder(state, rng) -> (path, form data)
+Scenario = collections.namedtuple('Scenario', 'name method endpoint status build')
+
+
+def _venue_form(state, rng, name):
+  city, state_code, _ = rng.choice(CITIES)
+  return {'name': name, 'city': city, 'state': state_code, 'address': '%d Main St' % rng.randint(1, 4000),
+          'phone': '555-555-%04d' % rng.randint(0, 9999), 'genres': rng.sample(GENRES, 2),
+          'facebook_link': 'https://www.facebook.com/bench', 'seeking_talent': 'True',
+          'seeking_description': 'Benchmark venue', 'csrf_token': state['csrf_token']}
+
+def _artist_form(state, rng, name):
+  city, state_code, _ = rng.choice(CITIES)
+  return {'name': name, 'city': city, 'state': state_code, 'phone': '555-555-%04d' % rng.randint(0, 9999),
+          'genres': rng.sample(GENRES, 2), 'facebook_link': 'https://www.facebook.com/bench',
+          'seeking_venue': 'y', 'csrf_token': state['csrf_token']}
+
+def _season_start(state):
+  # a fresh twelve-week season per request, so seasons never clash
+  state['seasons'] = state.get('seasons', 0) + 1
+  return (datetime.datetime(2040, 1, 6, 20) + datetime.timedelta(weeks=12 * state['seasons'])).strftime('%Y-%m-%d %H:%M')
+
+def _show_start(state):
+  # a fresh evening per request, so venues and artists are never double-booked
+  state['show_days'] = state.get('show_days', 0) + 1
+  return (datetime.datetime(2038, 1, 1, 20) + datetime.timedelta(days=state['show_days'])).strftime('%Y-%m-%d %H:%M:%S')
+
+def _venue(state, rng):
+  return rng.randint(1, state['venues'])
+
+def _artist(state, rng):
+  return rng.randint(1, state['artists'])
+
+READS = (
+  Scenario('index', 'GET', 'pages.index', 200, lambda s, r: ('/', None)),
+  Scenario('venues', 'GET', 'venues.venues', 200, lambda s, r: ('/venues', None)),
+  Scenario('venues_next_page', 'GET', 'venues.venues', 200, lambda s, r: (s['venues_next'], None)),
+  Scenario('venues_by_genre', 'GET', 'venues.venues', 200, lambda s, r: ('/venues?genre=%s' % r.choice(GENRES[:5]), None)),
+  Scenario('venue', 'GET', 'venues.show_venue', 200, lambda s, r: ('/venues/%d' % _venue(s, r), None)),
+  Scenario('venue_edit_form', 'GET', 'venues.edit_venue', 200, lambda s, r: ('/venues/%d/edit' % _venue(s, r), None)),
+  Scenario('venue_create_form', 'GET', 'venues.create_venue_form', 200, lambda s, r: ('/venues/create', None)),
+  Scenario('venue_search', 'POST', 'venues.search_venues', 200, lambda s, r: ('/venues/search', {'search_term': r.choice(ADJECTIVES)})),
+  Scenario('artists', 'GET', 'artists.artists', 200, lambda s, r: ('/artists', None)),
+  Scenario('artists_by_genre', 'GET', 'artists.artists', 200, lambda s, r: ('/artists?genre=%s' % r.choice(GENRES[:5]), None)),
+  Scenario('artist', 'GET', 'artists.show_artist', 200, lambda s, r: ('/artists/%d' % _artist(s, r), None)),
+  Scenario('artist_edit_form', 'GET', 'artists.edit_artist', 200, lambda s, r: ('/artists/%d/edit' % _artist(s, r), None)),
+  Scenario('artist_create_form', 'GET', 'artists.create_artist_form', 200, lambda s, r: ('/artists/create', None)),
+  Scenario('artist_search', 'POST', 'artists.search_artists', 200, lambda s, r: ('/artists/search', {'search_term': r.choice(NOUNS)})),
+  Scenario('shows', 'GET', 'shows.shows', 200, lambda s, r: ('/shows', None)),
+  Scenario('shows_upcoming', 'GET', 'shows.shows', 200, lambda s, r: ('/shows?window=upcoming', None)),
+  Scenario('shows_next_page', 'GET', 'shows.shows', 200, lambda s, r: (s['shows_next'], None)),
+  Scenario('show_create_form', 'GET', 'shows.create_shows', 200, lambda s, r: ('/shows/create', None)),
+  Scenario('show_schedule_form', 'GET', 'shows.schedule_shows_form', 200, lambda s, r: ('/shows/schedule', None)),
+  Scenario('api_venues', 'GET', 'api.venues', 200, lambda s, r: ('/api/v1/venues', None)),
+  Scenario('api_venue', 'GET', 'api.venue', 200, lambda s, r: ('/api/v1/venues/%d' % _venue(s, r), None)),
+  Scenario('api_artists', 'GET', 'api.artists', 200, lambda s, r: ('/api/v1/artists', None)),
+  Scenario('api_artist', 'GET', 'api.artist', 200, lambda s, r: ('/api/v1/artists/%d' % _artist(s, r), None)),
+  Scenario('api_shows', 'GET', 'api.shows', 200, lambda s, r: ('/api/v1/shows?window=upcoming', None)),
+  Scenario('api_show_conflicts', 'GET', 'api.show_conflicts', 200, lambda s, r: (
+    '/api/v1/shows/conflicts?venue_id=%d&artist_id=%d&start_time=%s' % (
+      _venue(s, r), _artist(s, r), (s['now'] + datetime.timedelta(days=r.randint(-30, 30), hours=20)).isoformat()), None)),
+  Scenario('metrics', 'GET', 'metrics', 200, lambda s, r: ('/metrics', None)),
+  Scenario('static', 'GET', 'static', 200, lambda s, r: ('/static/css/main.css', None)),
+)
+
+WRITES = (
+  Scenario('venue_create', 'POST', 'venues.create_venue_submission', 200,
+           lambda s, r: ('/venues/create', _venue_form(s, r, 'Benchmark Venue'))),
+  Scenario('artist_create', 'POST', 'artists.create_artist_submission', 200,
+           lambda s, r: ('/artists/create', _artist_form(s, r, 'Benchmark Artist'))),
+  Scenario('show_create', 'POST', 'shows.create_show_submission', 200, lambda s, r: ('/shows/create', {
+    'venue_id': _venue(s, r), 'artist_id': _artist(s, r), 'start_time': _show_start(s),
+    'csrf_token': s['csrf_token']})),
+  Scenario('show_schedule', 'POST', 'shows.schedule_shows_submission', 200, lambda s, r: ('/shows/schedule', {
+    'venue_id': _venue(s, r), 'artist_id': _artist(s, r), 'start_time': _season_start(s), 'recurrence': 'FREQ=WEEKLY;COUNT=12',
+    'csrf_token': s['csrf_token']})),
+  Scenario('venue_edit', 'POST', 'venues.edit_venue_submission', 302, lambda s, r: (
+    '/venues/%d/edit' % _venue(s, r), _venue_form(s, r, 'Edited Venue'))),
+  Scenario('artist_edit', 'POST', 'artists.edit_artist_submission', 302, lambda s, r: (
+    '/artists/%d/edit' % _artist(s, r), _artist_form(s, r, 'Edited Artist'))),
+)
+
+# deletes the venues created by venue_create, one per request
+DELETE = Scenario('venue_delete', 'DELETE', 'venues.delete_venue', 302,
+                  lambda s, r: ('/venues/%d' % s['created_venues'].pop(), None))
+
+
+class StatementCounter(object):
+  def __init__(self, *engines):
+    self.count = 0
+    for engine in engines:
+      event.listen(engine, 'after_cursor_execute', self)
+
+  def __call__(self, *args):
+    self.count += 1
+
+
+def _percentile(values, fraction):
+  return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def _next_url(client, path):
+  # the page's own "next" link, so cursors stay opaque to the suite
+  page = client.get(path).get_data(as_text=True)
+  match = re.search(r'href="([^"]*[?&]cursor=[^"]*)"', page)
+  return html.unescape(match.group(1)) if match else path
+
+def measure(client, counter, scenario, state, count, rng):
+  latencies, statements, errors = [], [], 0
+  for _ in range(count):
+    path, data = scenario.build(state, rng)
+    counter.count = 0
+    started = time.perf_counter()
+    response = client.open(path, method=scenario.method, data=data)
+    body = response.get_data()
+    response.close()
+    latencies.append(time.perf_counter() - started)
+    statements.append(counter.count)
+    if response.status_code != scenario.status or (scenario.method == 'POST' and FAILED_FORM.search(body)):
+      errors += 1
+  latencies.sort()
+  return {
+    'endpoint': scenario.endpoint,
+    'requests': count,
+    'errors': errors,
+    'requests_per_second': count / sum(latencies),
+    'latency_ms': {
+      'mean': sum(latencies) / count * 1000,
+      'p50': _percentile(latencies, 0.5) * 1000,
+      'p95': _percentile(latencies, 0.95) * 1000,
+      'p99': _percentile(latencies, 0.99) * 1000,
+    },
+    'sql_statements': {'mean': sum(statements) / count, 'max': max(statements)},
+  }
+
+
+def _commit():
+  try:
+    return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                                   stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def drain_jobs(counter):
+  # runs the queued jobs in this process, as `flask jobs work --once` would
+  before = counter.count
+  started = time.perf_counter()
+  done = work(once=True)
+  elapsed = time.perf_counter() - started
+  return {'jobs': done, 'jobs_per_second': done / elapsed if elapsed and done else 0.0,
+          'sql_statements_per_job': (counter.count - before) / float(done) if done else 0.0}
+
+def run(args):
+  app.config.update(SQLALCHEMY_DATABASE_URI=args.database_url, ENFORCE_QUERY_BUDGET=False,
+                    SLOW_REQUEST_MS=0, SLOW_QUERY_MS=0, JOBS_EMBEDDED_WORKER=False)
+  rng = random.Random(args.seed)
+  report = {'commit': _commit(), 'python': platform.python_version(), 'scenarios': {}}
+  now, engines = None, []
+  if args.replica_database_url:
+    # an identical catalog stands in for a replica that has caught up
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.replica_database_url
+    with app.app_context():
+      now = datetime.datetime.fromisoformat(generate(args.venues, args.artists, args.shows, args.seed)['now'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    replicas.configure(app, [args.replica_database_url])
+    with app.app_context():
+      engines.append(db.get_engine(app, bind=replicas.names[0]))
+  with app.app_context():
+    report['dataset'] = generate(args.venues, args.artists, args.shows, args.seed, now)
+    engine = db.get_engine()
+    report['database'] = engine.dialect.name
+    counter = StatementCounter(engine, *engines)
+    replica_counter = StatementCounter(*engines)
+
+  client = app.test_client()
+  form = client.get('/venues/create').get_data(as_text=True)
+  state = {'venues': args.venues, 'artists': args.artists,
+           'now': datetime.datetime.fromisoformat(report['dataset']['now']),
+           'csrf_token': re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', form).group(1),
+           'venues_next': _next_url(client, '/venues'), 'shows_next': _next_url(client, '/shows')}
+
+  for scenario in READS:
+    measure(client, counter, scenario, state, args.warmup, rng)
+    report['scenarios'][scenario.name] = measure(client, counter, scenario, state, args.requests, rng)
+  for scenario in WRITES:
+    report['scenarios'][scenario.name] = measure(client, counter, scenario, state, args.write_requests, rng)
+  with app.app_context():
+    report['jobs'] = drain_jobs(counter)
+    state['created_venues'] = [row.id for row in db.session.query(Venue.id).filter(Venue.id > args.venues)]
+  if state['created_venues']:
+    report['scenarios'][DELETE.name] = measure(client, counter, DELETE, state, len(state['created_venues']), rng)
+
+  if engines:
+    report['replica_statements'] = replica_counter.count
+  exercised = {result['endpoint'] for result in report['scenarios'].values()}
+  report['unexercised_endpoints'] = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - exercised)
+  for name, result in report['scenarios'].items():
+    print('%-20s %8.1f req/s  p50 %7.2f ms  p99 %7.2f ms  %5.1f SQL%s' % (
+      name, result['requests_per_second'], result['latency_ms']['p50'], result['latency_ms']['p99'],
+      result['sql_statements']['mean'], '  %d errors' % result['errors'] if result['errors'] else ''), file=sys.stderr)
+  print('%-20s %8.1f jobs/s  %d jobs  %5.1f SQL' % ('jobs', report['jobs']['jobs_per_second'], report['jobs']['jobs'],
+                                                       report['jobs']['sql_statements_per_job']), file=sys.stderr)
+  if engines:
+    print('%-20s %d SQL statements' % ('replica', report['replica_statements']), file=sys.stderr)
+  if report['unexercised_endpoints']:
+    print('not exercised: %s' % ', '.join(report['unexercised_endpoints']), file=sys.stderr)
+
+  output = sys.stdout if args.output == '-' else open(args.output, 'w')
+  json.dump(report, output, indent=2)
+  output.write('\n')
+  return 1 if any(result['errors'] for result in report['scenarios'].values()) else 0
+
+
+def compare(args):
+  with open(args.before) as before_file, open(args.after) as after_file:
+    before, after = json.load(before_file), json.load(after_file)
+  print('%s -> %s' % (before.get('commit'), after.get('commit')))
+  regressions = 0
+  for name, new in after['scenarios'].items():
+    old = before['scenarios'].get(name)
+    if old is None:
+      print('%-20s new' % name)
+      continue
+    ratio = new['latency_ms']['p50'] / old['latency_ms']['p50']
+    extra_sql = new['sql_statements']['mean'] - old['sql_statements']['mean']
+    regressed = ratio > 1 + args.threshold or extra_sql > 0
+    regressions += regressed
+    print('%-20s p50 %7.2f -> %7.2f ms (%+5.0f%%)  SQL %5.1f -> %5.1f%s' % (
+      name, old['latency_ms']['p50'], new['latency_ms']['p50'], (ratio - 1) * 100,
+      old['sql_statements']['mean'], new['sql_statements']['mean'], '  REGRESSION' if regressed else ''))
+  return 1 if regressions else 0
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  commands = parser.add_subparsers(dest='command')
+  commands.required = True
+  run_parser = commands.add_parser('run', help='seed a catalog and benchmark every route')
+  run_parser.add_argument('--database-url', default='sqlite:///suite_bench.db')
+  run_parser.add_argument('--venues', type=int, default=500)
+  run_parser.add_argument('--artists', type=int, default=1000)
+  run_parser.add_argument('--shows', type=int, default=20000)
+  run_parser.add_argument('--seed', type=int, default=0)
+  run_parser.add_argument('--replica-database-url', help='also seed this database and read it as a replica')
+  run_parser.add_argument('--requests', type=int, default=200, help='measured requests per read scenario')
+  run_parser.add_argument('--write-requests', type=int, default=50, help='measured requests per write scenario')
+  run_parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per read scenario')
+  run_parser.add_argument('--output', default='-', help='file for the JSON report (default stdout)')
+  run_parser.set_defaults(handler=run)
+  compare_parser = commands.add_parser('compare', help='diff two reports')
+  compare_parser.add_argument('before')
+  compare_parser.add_argument('after')
+  compare_parser.add_argument('--threshold', type=float, default=0.1, help='allowed p50 slowdown (default 10%%)')
+  compare_parser.set_defaults(handler=compare)
+  args = parser.parse_args()
+  sys.exit(args.handler(args))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,92 @@
+"""Venue/artist create throughput: two commits per create versus one.
+
+"two_commits" replays the original create_*_submission flow (commit the
+entity, then bulk-save and commit its genre tags); "one_commit" is the
+current flow (genres attached through the relationship, a single commit).
+Use a file-backed SQLite database or Postgres so commits pay for fsync.
+
+    python benchmarks/write_throughput.py --database-url sqlite:///write_bench.db --creates 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config import db
+from models import *
+from lookups import area_id, genre_ids
+
+GENRES = ['Jazz', 'Blues', 'Folk']
+
+
+def venue_fields(i):
+  return {'name': 'Venue %d' % i, 'address': '%d Main St' % i, 'city': 'San Francisco', 'state': 'CA',
+          'phone': '555-0100', 'seeking_talent': False}
+
+
+def artist_fields(i):
+  return {'name': 'Artist %d' % i, 'city': 'San Francisco', 'state': 'CA', 'phone': '555-0100',
+          'seeking_venue': False}
+
+
+def two_commits(i):
+  venue = Venue(**venue_fields(i))
+  venue.area_id = area_id(venue.city, venue.state)
+  venue.stats = VenueStats()
+  db.session.add(venue)
+  db.session.commit()
+  db.session.bulk_save_objects([GenreTagsForVenues(venue_id=venue.id, genre_id=genre_id) for genre_id in genre_ids(GENRES).values()])
+  db.session.commit()
+
+  artist = Artist(**artist_fields(i))
+  db.session.add(artist)
+  db.session.commit()
+  db.session.bulk_save_objects([GenreTagsForArtists(artist_id=artist.id, genre_id=genre_id) for genre_id in genre_ids(GENRES).values()])
+  db.session.commit()
+  db.session.close()
+
+
+def one_commit(i):
+  venue = Venue(**venue_fields(i))
+  venue.area_id = area_id(venue.city, venue.state)
+  venue.genres = [GenreTagsForVenues(genre_id=genre_id) for genre_id in genre_ids(GENRES).values()]
+  venue.stats = VenueStats()
+  db.session.add(venue)
+  db.session.commit()
+
+  artist = Artist(**artist_fields(i))
+  artist.genres = [GenreTagsForArtists(genre_id=genre_id) for genre_id in genre_ids(GENRES).values()]
+  db.session.add(artist)
+  db.session.commit()
+  db.session.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', default='sqlite:///write_bench.db')
+  parser.add_argument('--creates', type=int, default=500, help='venue + artist pairs per variant')
+  args = parser.parse_args()
+
+  app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+  report = {'creates': args.creates}
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+    for name, create in (('two_commits', two_commits), ('one_commit', one_commit)):
+      started = time.perf_counter()
+      for i in range(args.creates):
+        create(i)
+      elapsed = time.perf_counter() - started
+      report[name] = {'creates_per_second': args.creates * 2 / elapsed, 'ms_per_create': elapsed / args.creates / 2 * 1000}
+    report['database'] = db.get_engine().dialect.name
+  report['speedup'] = report['one_commit']['creates_per_second'] / report['two_commits']['creates_per_second']
+  json.dump(report, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,210 @@
+import collections
+import functools
+import logging
+import pickle
+import threading
+import time
+
+from flask import current_app, request, session
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Read views are wrapped with @cache.cached(namespace) and their whole
+# response is stored under that namespace. Write handlers call
+# cache.invalidate(namespace, ...) after committing, which bumps the
+# namespace generation so every stored variant (e.g. each /shows cursor)
+# becomes unreachable at once and ages out through TTL/LRU. Stored
+# responses keep the ETag set by @conditional (applied below
+# @cache.cached), so a hit answers If-None-Match without any SQL.
+#
+# Backends:
+#   memory  per-process LRU with TTL; fine for a single worker
+#   redis   any Redis-protocol server shared by all workers; run it with
+#           maxmemory-policy volatile-lru so that generation counters, which
+#           have no TTL, are never evicted
+#   null    caching disabled
+#
+# With read replicas, invalidate() also marks the namespace for
+# invalidation_window seconds so its views read the primary until the
+# replicas have caught up (see routing.py).
+#----------------------------------------------------------------------------#
+
+class NullCache(object):
+  shared = True
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value, ttl=None):
+    pass
+
+  def generation(self, namespace):
+    return 0
+
+  def bump(self, namespace):
+    pass
+
+
+class MemoryCache(object):
+  # only the process holding it can invalidate its pages
+  shared = False
+
+  def __init__(self, max_entries=1024, default_ttl=60, clock=time.monotonic):
+    self.max_entries = max_entries
+    self.default_ttl = default_ttl
+    self._clock = clock
+    self._entries = collections.OrderedDict()
+    # kept apart from the LRU so an evicted counter cannot resurrect old entries
+    self._generations = collections.Counter()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      expires, value = entry
+      if expires is not None and expires <= self._clock():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    ttl = self.default_ttl if ttl is None else ttl
+    expires = self._clock() + ttl if ttl else None
+    with self._lock:
+      self._entries[key] = (expires, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def generation(self, namespace):
+    with self._lock:
+      return self._generations[namespace]
+
+  def bump(self, namespace):
+    with self._lock:
+      self._generations[namespace] += 1
+
+
+class RedisCache(object):
+  shared = True
+
+  def __init__(self, url, default_ttl=60, key_prefix='fyyur:'):
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError('CACHE_BACKEND = "redis" requires the redis package (pip install redis)')
+    self._client = redis.Redis.from_url(url)
+    self.default_ttl = default_ttl
+    self.key_prefix = key_prefix
+
+  def get(self, key):
+    value = self._client.get(self.key_prefix + key)
+    return None if value is None else pickle.loads(value)
+
+  def set(self, key, value, ttl=None):
+    ttl = self.default_ttl if ttl is None else ttl
+    self._client.set(self.key_prefix + key, pickle.dumps(value), ex=ttl or None)
+
+  def generation(self, namespace):
+    return int(self._client.get(self.key_prefix + 'generation:' + namespace) or 0)
+
+  def bump(self, namespace):
+    self._client.incr(self.key_prefix + 'generation:' + namespace)
+
+
+def make_backend(config):
+  backend = config.get('CACHE_BACKEND', 'memory')
+  if backend == 'memory':
+    return MemoryCache(config.get('CACHE_MAX_ENTRIES', 1024), config.get('CACHE_DEFAULT_TTL', 60))
+  if backend == 'redis':
+    return RedisCache(config['CACHE_REDIS_URL'], config.get('CACHE_DEFAULT_TTL', 60))
+  if backend == 'null':
+    return NullCache()
+  raise ValueError('unknown CACHE_BACKEND %r' % backend)
+
+
+class ResponseCache(object):
+  def __init__(self, app=None):
+    self.backend = NullCache()
+    self.logger = logging.getLogger(__name__)
+    self.invalidation_window = 0
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.backend = make_backend(app.config)
+    # streamed bodies finish after the app context is gone, so keep a handle
+    self.logger = app.logger
+    app.extensions['response_cache'] = self
+
+  def _key(self, namespace):
+    return '%s:%d:%s' % (namespace, self.backend.generation(namespace), request.full_path)
+
+  def cached(self, namespace, ttl=None):
+    # namespace is a string or a function of the view arguments,
+    # e.g. lambda venue_id: 'show_venue:%d' % venue_id
+    def decorator(view):
+      @functools.wraps(view)
+      def wrapper(*args, **kwargs):
+        # pending flash messages are rendered into the page, so such a
+        # response is neither served from nor written to the cache
+        if request.method != 'GET' or session.get('_flashes'):
+          return view(*args, **kwargs)
+        name = namespace(*args, **kwargs) if callable(namespace) else namespace
+        try:
+          key = self._key(name)
+          hit = self.backend.get(key)
+        except Exception:
+          self.logger.warning('response cache read failed', exc_info=True)
+          return view(*args, **kwargs)
+        if hit is not None:
+          body, status, headers = hit
+          response = current_app.response_class(body, status=status, headers=headers)
+          # stored validators still answer If-None-Match / If-Modified-Since
+          return response.make_conditional(request)
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+          if response.is_streamed:
+            response.response = self._store_when_done(key, response, response.response, ttl)
+          else:
+            self._store(key, (response.get_data(), response.status_code, list(response.headers)), ttl)
+        return response
+      wrapper.cache_namespace = namespace
+      return wrapper
+    return decorator
+
+  def _store_when_done(self, key, response, body, ttl):
+    # pass a streamed body through and cache it once it has been fully sent
+    chunks = []
+    for chunk in body:
+      chunk = chunk.encode(response.charset) if isinstance(chunk, str) else chunk
+      chunks.append(chunk)
+      yield chunk
+    self._store(key, (b''.join(chunks), response.status_code, list(response.headers)), ttl)
+
+  def _store(self, key, value, ttl):
+    try:
+      self.backend.set(key, value, ttl)
+    except Exception:
+      self.logger.warning('response cache write failed', exc_info=True)
+
+  def invalidate(self, *namespaces):
+    for namespace in namespaces:
+      try:
+        self.backend.bump(namespace)
+        if self.invalidation_window:
+          self.backend.set('invalidated:' + namespace, True, self.invalidation_window)
+      except Exception:
+        self.logger.error('response cache invalidation of %s failed', namespace, exc_info=True)
+
+  def recently_invalidated(self, namespace):
+    try:
+      return self.backend.get('invalidated:' + namespace) is not None
+    except Exception:
+      self.logger.warning('response cache read failed', exc_info=True)
+      return True
@@ -0,0 +1,143 @@
+import datetime
+import os
+import threading
+import time
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from config import db, instrumentation
+from models import *
+from assets import build as build_assets, clean as clean_assets
+from jobs import work, queue_stats
+from stats import sweep_venue_stats, rebuild_venue_stats
+from warmup import precompile_templates, warm_up
+
+#----------------------------------------------------------------------------#
+# Maintenance commands (`flask <group> <command>`), registered by
+# create_app. The importer (and with it dateutil) is loaded by `flask import` only.
+#----------------------------------------------------------------------------#
+
+venue_stats_cli = AppGroup('venue-stats', help='Maintain the venue_stats aggregate.')
+
+@venue_stats_cli.command('sweep')
+def sweep_venue_stats_command():
+  # run periodically (e.g. every minute from cron) so past shows drop out of the counts
+  swept = sweep_venue_stats()
+  db.session.commit()
+  click.echo('refreshed %d venues' % swept)
+
+@venue_stats_cli.command('rebuild')
+def rebuild_venue_stats_command():
+  rebuilt = rebuild_venue_stats()
+  db.session.commit()
+  click.echo('rebuilt %d venues' % rebuilt)
+
+jobs_cli = AppGroup('jobs', help='Run and inspect the background job queue.')
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+@click.option('--poll-interval', type=float, help='Seconds to wait when idle (default JOBS_POLL_INTERVAL).')
+@click.option('--metrics-port', type=int, help='Serve this worker\'s /metrics on the port.')
+def jobs_work_command(once, poll_interval, metrics_port):
+  # run as many as needed; workers claim jobs with SKIP LOCKED and never block each other
+  if metrics_port:
+    serve_worker_metrics(current_app._get_current_object(), metrics_port)
+  done = work(instrumentation.metrics, once=once,
+              idle_sleep=poll_interval or current_app.config['JOBS_POLL_INTERVAL'])
+  click.echo('ran %d jobs' % done)
+
+@jobs_cli.command('status')
+def jobs_status_command():
+  stats = queue_stats()
+  for state in ('queued', 'failed'):
+    for kind, count in sorted(stats[state].items()):
+      click.echo('%-8s %-30s %d' % (state, kind, count))
+  click.echo('oldest queued job: %.1f s' % stats['oldest_age_seconds'])
+
+@jobs_cli.command('retry')
+@click.option('--kind', help='Only requeue failed jobs of this kind.')
+def jobs_retry_command(kind):
+  failed = db.session.query(Job).filter(Job.failed_at != None)
+  if kind:
+    failed = failed.filter(Job.kind == kind)
+  requeued = failed.update({Job.failed_at: None, Job.attempts: 0, Job.run_at: datetime.datetime.now()},
+                           synchronize_session=False)
+  db.session.commit()
+  click.echo('requeued %d jobs' % requeued)
+
+def serve_worker_metrics(app, port):
+  # the worker's counters and histograms, plus the queue gauges, in a daemon thread
+  class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+      pass
+  def metrics_app(environ, start_response):
+    with app.app_context():
+      body = instrumentation.render_metrics().encode('utf-8')
+      db.session.remove()
+    start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4'), ('Content-Length', str(len(body)))])
+    return [body]
+  server = make_server('', port, metrics_app, handler_class=QuietHandler)
+  threading.Thread(target=server.serve_forever, name='fyyur-jobs-metrics', daemon=True).start()
+
+assets_cli = AppGroup('assets', help='Build the fingerprinted, precompressed static files.')
+
+@assets_cli.command('build')
+@click.option('--prune', is_flag=True, help='Delete hashed files left over from earlier builds.')
+def assets_build_command(prune):
+  # run on deploy, before the web processes (re)start and load the manifest
+  manifest = build_assets(current_app.static_folder, current_app.static_url_path, prune)
+  click.echo('built %d files (%d compressed) into %s' % (
+    len(manifest['files']), len(manifest['compressed']), os.path.join(current_app.static_folder, 'dist')))
+
+@assets_cli.command('clean')
+def assets_clean_command():
+  click.echo('removed the manifest' if clean_assets(current_app.static_folder) else 'nothing built')
+
+templates_cli = AppGroup('templates', help='Precompile templates into the shared bytecode cache.')
+
+@templates_cli.command('compile')
+def templates_compile_command():
+  # run on deploy, before the workers start; fails on a template that does not compile
+  started = time.perf_counter()
+  names = precompile_templates(current_app)
+  click.echo('compiled %d templates in %.0f ms into %s' % (
+    len(names), (time.perf_counter() - started) * 1000, current_app.config['TEMPLATE_CACHE_DIR'] or 'memory only'))
+
+@click.command('warmup')
+@with_appcontext
+def warmup_command():
+  # compiles the templates, then requests every GET route once and reports what failed
+  app = current_app._get_current_object()
+  app.config['JOBS_EMBEDDED_WORKER'] = False
+  names = precompile_templates(app)
+  results = warm_up(app)
+  failed = [(path, status) for path, status, _ in results if status >= 500]
+  for path, status, elapsed in results:
+    click.echo('%3d %7.1f ms  %s' % (status, elapsed, path))
+  click.echo('compiled %d templates, requested %d routes' % (len(names), len(results)))
+  if failed:
+    raise click.ClickException('%d routes failed: %s' % (len(failed), ', '.join(path for path, _ in failed)))
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True)
+@with_appcontext
+def import_command(kind, path, format, batch_size):
+  # bulk load a CSV/NDJSON catalog; re-running the same file resumes it
+  from importer import run_import
+  format = format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+  def report(rows_done, rows_per_second):
+    click.echo('%s: %d rows committed (%.0f rows/s)' % (path, rows_done, rows_per_second))
+  with open(path, newline='' if format == 'csv' else None, encoding='utf-8') as stream:
+    try:
+      imported, skipped = run_import(kind, stream, format, os.path.abspath(path), batch_size, report)
+    except ValueError as error:
+      raise click.ClickException('%s (fix the file and re-run to resume)' % error)
+  click.echo('imported %d %s from %s (%d already imported)' % (imported, kind, path, skipped))
+
+COMMANDS = (venue_stats_cli, jobs_cli, assets_cli, templates_cli, warmup_command, import_command)
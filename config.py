@@ -1,8 +1,10 @@
 import os
-from flask import Flask
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+import time
+from assets import Assets
+from cache import ResponseCache
+from dbpool import PooledSQLAlchemy
+from instrumentation import Instrumentation
+from routing import ReplicaRouter
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -10,15 +12,93 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
+# Fail requests whose views exceed their @query_budget (development only).
+ENFORCE_QUERY_BUDGET = DEBUG
+
 # Connect to the database
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'ENTER YOUR DB INFO HERE'
-
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
-db = SQLAlchemy(app)
-migrate = Migrate(app,db)
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'ENTER YOUR DB INFO HERE')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+def env_flag(name, default):
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+# Connection pool, per worker process (see dbpool.py). Postgres only.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Recycle before the server or a load balancer closes idle connections.
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', True)
+# 0 disables the server-side statement timeout.
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+# Let PgBouncer (transaction pooling) own the pool.
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER', False)
+
+# Read replicas for the read-only views (see routing.py), comma separated;
+# empty sends every query to the primary. Each replica gets its own pool.
+SQLALCHEMY_REPLICA_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+# Replicas further behind are skipped; the lag is checked this often per process.
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_LAG_CHECK_SECONDS = 1.0
+# How long a browser reads the primary after its own POST (read-your-writes).
+REPLICA_STICKY_SECONDS = max(10, REPLICA_MAX_LAG_SECONDS + REPLICA_LAG_CHECK_SECONDS)
+
+# Number of city/state groups rendered per /venues page.
+VENUE_AREAS_PAGE_SIZE = 20
+
+# Number of show tiles rendered per /shows page (keyset paginated).
+SHOWS_PAGE_SIZE = 30
+SHOWS_MAX_PAGE_SIZE = 100
+
+# Number of venues/artists per /api/v1/venues and /api/v1/artists page (paged by id).
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Maximum number of shows listed by one /shows/schedule submission.
+SHOW_SCHEDULE_MAX_DATES = 366
+
+# Maximum number of ranked hits returned by venue/artist search.
+SEARCH_RESULT_LIMIT = 20
+
+# Response cache for read pages (see cache.py): 'memory', 'redis' or 'null'.
+# Use 'redis' when running more than one worker so invalidation is shared.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TTL = 60
+CACHE_MAX_ENTRIES = 1024
+
+# Background jobs (see jobs.py). Without the embedded worker, run `flask jobs work`.
+JOBS_MAX_ATTEMPTS = 5
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1.0))
+JOBS_EMBEDDED_WORKER = env_flag('JOBS_EMBEDDED_WORKER', CACHE_BACKEND == 'memory')
+# Jobs of a process that stopped are run by any worker after this many seconds.
+JOBS_OWNER_TIMEOUT = 60
+
+# Request instrumentation (see instrumentation.py). 0 disables the slow logs.
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+METRICS_ENABLED = env_flag('METRICS_ENABLED', True)
+# Opt-in cProfile sampling: fraction of requests, optionally only these endpoints.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_ENDPOINTS = [name for name in os.environ.get('PROFILE_ENDPOINTS', '').split(',') if name]
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+
+# Compiled templates shared by all workers (see warmup.py); empty disables the cache.
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(basedir, '.template_cache'))
+
+# Cache lifetime of the content-hashed files written by `flask assets build` (see assets.py).
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Mixed into every ETag; set RELEASE_VERSION per deploy so template changes
+# invalidate browser copies. Defaults to the process start time.
+ETAG_VERSION = os.environ.get('RELEASE_VERSION', str(int(time.time())))
+
+# Extensions, bound to the app by create_app() in app.py.
+db = PooledSQLAlchemy()
+cache = ResponseCache()
+assets = Assets()
+instrumentation = Instrumentation()
+replicas = ReplicaRouter()
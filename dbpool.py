@@ -0,0 +1,126 @@
+import threading
+import time
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, exc, orm
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import NullPool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Engine and connection pool.
+#
+# Pool settings come from the DB_* config keys (see config.py) and apply to
+# Postgres only; SQLite keeps SQLAlchemy's defaults. Every gunicorn worker
+# owns its own pool, so size it as
+#     workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) <= connections you can spare
+# With DB_PGBOUNCER set, pooling is left to PgBouncer (transaction mode):
+# the app opens a connection per checkout and only uses transaction-scoped
+# settings.
+# Sessions send the reads of @replicas.read_only views to the replica bind
+# picked for the request (see routing.py); writes stay on the primary.
+#----------------------------------------------------------------------------#
+
+class PoolMetrics(object):
+  # checkout wait times and saturation of one pool, safe to read from any thread
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.checkouts = 0
+    self.timeouts = 0
+    self.wait_total = 0.0
+    self.wait_max = 0.0
+    self.saturated_checkouts = 0
+
+  def record(self, wait, saturated, timed_out=False):
+    with self._lock:
+      self.checkouts += 1
+      self.wait_total += wait
+      self.wait_max = max(self.wait_max, wait)
+      self.saturated_checkouts += saturated
+      self.timeouts += timed_out
+
+  def snapshot(self, pool):
+    with self._lock:
+      capacity = pool.size() + max(pool._max_overflow, 0)
+      return {
+        'pool_size': pool.size(),
+        'max_overflow': pool._max_overflow,
+        'checked_out': pool.checkedout(),
+        'saturation': pool.checkedout() / float(capacity) if capacity else 0.0,
+        'checkouts': self.checkouts,
+        'saturated_checkouts': self.saturated_checkouts,
+        'timeouts': self.timeouts,
+        'checkout_wait_avg_ms': self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+        'checkout_wait_max_ms': self.wait_max * 1000,
+      }
+
+
+class InstrumentedQueuePool(QueuePool):
+  def __init__(self, *args, **kwargs):
+    super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+    self.metrics = PoolMetrics()
+
+  def _do_get(self):
+    # a checkout is saturated when every pooled and overflow slot is taken
+    saturated = self.checkedout() >= self.size() + max(self._max_overflow, 0)
+    started = time.perf_counter()
+    try:
+      connection = super(InstrumentedQueuePool, self)._do_get()
+    except exc.TimeoutError:
+      self.metrics.record(time.perf_counter() - started, saturated, timed_out=True)
+      raise
+    self.metrics.record(time.perf_counter() - started, saturated)
+    return connection
+
+
+def pool_options(config):
+  if config['DB_PGBOUNCER']:
+    return {'poolclass': NullPool}
+  options = {
+    'poolclass': InstrumentedQueuePool,
+    'pool_size': config['DB_POOL_SIZE'],
+    'max_overflow': config['DB_MAX_OVERFLOW'],
+    'pool_timeout': config['DB_POOL_TIMEOUT'],
+    'pool_recycle': config['DB_POOL_RECYCLE'],
+    'pool_pre_ping': config['DB_POOL_PRE_PING'],
+  }
+  if config['DB_STATEMENT_TIMEOUT_MS']:
+    options['connect_args'] = {'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']}
+  return options
+
+
+def pool_stats(engine):
+  metrics = getattr(engine.pool, 'metrics', None)
+  return metrics.snapshot(engine.pool) if metrics else None
+
+
+class RoutingSession(SignallingSession):
+  def get_bind(self, mapper=None, clause=None):
+    bind = g.get('_db_bind') if has_app_context() else None
+    if bind is not None and not self._flushing and not isinstance(clause, UpdateBase):
+      return get_state(self.app).db.get_engine(self.app, bind=bind)
+    return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def create_engine(self, sa_url, engine_opts):
+    config = current_app.config
+    if sa_url.drivername.startswith('postgresql'):
+      # explicit SQLALCHEMY_ENGINE_OPTIONS still win
+      engine_opts = dict(pool_options(config), **engine_opts)
+    if sa_url.drivername in ('postgresql', 'postgresql+psycopg2'):
+      # send executemany INSERTs (bulk import, genre tags) as multi-row VALUES
+      engine_opts.setdefault('executemany_mode', 'values')
+    engine = super(PooledSQLAlchemy, self).create_engine(sa_url, engine_opts)
+
+    if sa_url.drivername.startswith('postgresql') and config['DB_PGBOUNCER'] and config['DB_STATEMENT_TIMEOUT_MS']:
+      # PgBouncer drops startup options and shares server sessions, so the
+      # timeout has to be scoped to each transaction
+      @event.listens_for(engine, 'begin')
+      def set_statement_timeout(connection):
+        connection.execute('SET LOCAL statement_timeout = %d' % config['DB_STATEMENT_TIMEOUT_MS'])
+
+    return engine
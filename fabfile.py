@@ -5,9 +5,11 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # drives every route against a scratch SQLite catalog; fails on any error response
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m benchmarks.suite run --database-url sqlite:///suite_bench.db"
+            " --requests 5 --write-requests 2 --output suite_report.json", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -1,14 +1,14 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Optional, Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, Regexp, NumberRange
 
 class ShowForm(Form):
-    artist_id = StringField(
+    artist_id = IntegerField(
         'artist_id',
         validators=[DataRequired()],
     )
-    venue_id = StringField(
+    venue_id = IntegerField(
         'venue_id',
         validators=[DataRequired()]
     )
@@ -17,6 +17,39 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        # minutes; models.DEFAULT_SHOW_DURATION when empty
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=24 * 60)]
+    )
+
+class ScheduleShowsForm(Form):
+    # the first show, optionally repeated by an RRULE, and/or a list of dates
+    artist_id = IntegerField(
+        'artist_id',
+        validators=[DataRequired()],
+    )
+    venue_id = IntegerField(
+        'venue_id',
+        validators=[DataRequired()]
+    )
+    start_time = DateTimeField(
+        'start_time',
+        validators=[Optional()],
+        format='%Y-%m-%d %H:%M'
+    )
+    recurrence = StringField(
+        'recurrence',
+        validators=[Optional()]
+    )
+    dates = TextAreaField(
+        'dates',
+        validators=[Optional()]
+    )
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=24 * 60)]
+    )
 
 class VenueForm(Form):
     name = StringField(
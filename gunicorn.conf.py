@@ -0,0 +1,34 @@
+import os
+
+#----------------------------------------------------------------------------#
+# gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once, in the master, and the workers are forked from
+# it: they start without importing anything and share the loaded code and
+# compiled templates copy-on-write (see warmup.preload). Restart the master,
+# not just the workers, to deploy new code.
+#
+# The default memory response cache lives in each worker, so a write only
+# expires the pages of the worker that served it. Run more than one worker
+# (WEB_CONCURRENCY) only with CACHE_BACKEND=redis, or =null; until then a
+# single worker is started.
+#----------------------------------------------------------------------------#
+
+bind = os.environ.get('BIND', '0.0.0.0:%s' % os.environ.get('PORT', '5000'))
+workers = int(os.environ.get('WEB_CONCURRENCY', 1 if os.environ.get('CACHE_BACKEND', 'memory') == 'memory' else 4))
+preload_app = True
+
+def when_ready(server):
+  # runs in the master after the app was loaded, before the first fork
+  from app import app
+  from warmup import preload
+  if app.config['CACHE_BACKEND'] == 'memory' and server.cfg.workers > 1:
+    server.log.warning('%d workers share no response cache (CACHE_BACKEND=memory): '
+                       'pages stay stale in the other workers until CACHE_DEFAULT_TTL; use CACHE_BACKEND=redis',
+                       server.cfg.workers)
+  preload(app)
+
+def post_fork(server, worker):
+  from app import app
+  from warmup import after_fork
+  after_fork(app)
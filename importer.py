@@ -0,0 +1,220 @@
+import csv
+import datetime
+import itertools
+import json
+import time
+
+import click
+import dateutil.parser
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+
+from config import db, cache
+from models import *
+from stats import refresh_venue_stats
+from lookups import area_ids, genre_ids
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Streams venues, artists or shows from CSV or NDJSON and inserts them in
+# batches with one multi-row INSERT per table per batch (psycopg2 sends
+# these as execute_values). Each batch commits together with a row in
+# import_checkpoint, so re-running the same import resumes after the last
+# committed batch. Only one batch is ever held in memory.
+#
+# CSV genre cells hold several genres separated by ';'. NDJSON uses a list.
+#----------------------------------------------------------------------------#
+
+GENRE_SEPARATOR = ';'
+
+def _flag(value):
+  if isinstance(value, bool):
+    return value
+  return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+def _optional(value):
+  return value if value not in (None, '') else None
+
+def _genres(value):
+  if isinstance(value, list):
+    genres = value
+  elif value is None or isinstance(value, str):
+    genres = (value or '').split(GENRE_SEPARATOR)
+  else:
+    raise ValueError('expected a list of names, got %r' % value)
+  for genre in genres:
+    if not isinstance(genre, str):
+      raise ValueError('genre names must be strings, got %r' % genre)
+  return sorted(set(genre.strip() for genre in genres if genre and genre.strip()))
+
+def _datetime(value):
+  if isinstance(value, datetime.datetime):
+    return value
+  return dateutil.parser.isoparse(value)
+
+def _id(value):
+  return int(value) if value not in (None, '') else None
+
+def _required(convert):
+  def required(value):
+    if value in (None, ''):
+      raise ValueError('missing value')
+    return convert(value)
+  return required
+
+_str, _int = _required(str), _required(int)
+
+VENUE_COLUMNS = {
+  'id': _id, 'name': _str, 'address': _str, 'city': _str, 'state': _str, 'phone': _str,
+  'website': _optional, 'facebook_link': _optional, 'image_link': _optional,
+  'seeking_talent': _flag, 'seeking_description': _optional,
+}
+ARTIST_COLUMNS = {
+  'id': _id, 'name': _str, 'city': _str, 'state': _str, 'phone': _str,
+  'website': _optional, 'facebook_link': _optional, 'image_link': _optional,
+  'seeking_venue': _flag, 'seeking_description': _optional,
+}
+def _optional_datetime(value):
+  return _datetime(value) if value not in (None, '') else None
+
+SHOW_COLUMNS = {'id': _id, 'venue_id': _int, 'artist_id': _int, 'start_time': _required(_datetime),
+                'end_time': _optional_datetime}
+
+def read_records(stream, format):
+  # yields one dict per record, lazily
+  if format == 'csv':
+    for record in csv.DictReader(stream):
+      yield record
+  elif format == 'ndjson':
+    for line in stream:
+      if line.strip():
+        yield json.loads(line)
+  else:
+    raise ValueError('unknown import format %r' % format)
+
+def _clean(record, columns, line):
+  row = {}
+  for name, convert in columns.items():
+    try:
+      row[name] = convert(record.get(name))
+    except (TypeError, ValueError) as error:
+      raise ValueError('record %d, %s: %s' % (line, name, error))
+  return row
+
+def _allocate_ids(table, count):
+  # reserve ids up front so genre tags can reference rows inserted in the same batch
+  if db.session.get_bind().dialect.name == 'postgresql':
+    return [row[0] for row in db.session.execute(
+      text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+      {'table': table.name, 'count': count})]
+  start = (db.session.query(func.max(table.c.id)).scalar() or 0) + 1
+  return list(range(start, start + count))
+
+def _sync_sequence(table):
+  # explicit ids from the file bypass the Postgres sequence
+  if db.session.get_bind().dialect.name == 'postgresql':
+    db.session.execute(text(
+      "SELECT setval(pg_get_serial_sequence(:table, 'id'), coalesce(max(id), 1)) FROM %s" % table.name),
+      {'table': table.name})
+
+def _insert_entities(batch, table, tag_table, owner_column):
+  # rows with ids from the file go in first, so the ids allocated for the rest come after them
+  explicit = [row for row in batch if row['id'] is not None]
+  missing = [row for row in batch if row['id'] is None]
+  if explicit:
+    db.session.execute(table.insert(), [{key: value for key, value in row.items() if key != 'genres'} for row in explicit])
+    _sync_sequence(table)
+  if missing:
+    for row, new_id in zip(missing, _allocate_ids(table, len(missing))):
+      row['id'] = new_id
+    db.session.execute(table.insert(), [{key: value for key, value in row.items() if key != 'genres'} for row in missing])
+  genres = genre_ids(genre for row in batch for genre in row['genres'])
+  tags = [{owner_column: row['id'], 'genre_id': genres[genre]} for row in batch for genre in row['genres']]
+  if tags:
+    db.session.execute(tag_table.insert(), tags)
+  return [row['id'] for row in batch]
+
+def _insert_venues(batch):
+  areas = area_ids((row['city'], row['state']) for row in batch)
+  for row in batch:
+    row['area_id'] = areas[(row['city'], row['state'])]
+  venue_ids = _insert_entities(batch, Venue.__table__, GenreTagsForVenues.__table__, 'venue_id')
+  db.session.execute(VenueStats.__table__.insert(), [{'venue_id': venue_id, 'upcoming_shows': 0} for venue_id in venue_ids])
+  return {'venues'}
+
+def _insert_artists(batch):
+  _insert_entities(batch, Artist.__table__, GenreTagsForArtists.__table__, 'artist_id')
+  return {'artists'}
+
+def _insert_shows(batch):
+  rows = [{key: value for key, value in row.items() if key != 'id' or value is not None} for row in batch]
+  for row in rows:
+    row['end_time'] = row['end_time'] or row['start_time'] + DEFAULT_SHOW_DURATION
+    if not row['start_time'] <= row['end_time'] <= row['start_time'] + MAX_SHOW_DURATION:
+      raise ValueError('show at %s: end_time must be within %s of start_time' % (row['start_time'], MAX_SHOW_DURATION))
+  with_id = [row for row in rows if 'id' in row]
+  without_id = [row for row in rows if 'id' not in row]
+  if with_id:
+    db.session.execute(Show.__table__.insert(), with_id)
+    _sync_sequence(Show.__table__)
+  if without_id:
+    db.session.execute(Show.__table__.insert(), without_id)
+  venue_ids = set(row['venue_id'] for row in rows)
+  artist_ids = set(row['artist_id'] for row in rows)
+  refresh_venue_stats(venue_ids)
+  return ({'shows', 'venues'} | set('show_venue:%s' % venue_id for venue_id in venue_ids)
+          | set('show_artist:%s' % artist_id for artist_id in artist_ids))
+
+KINDS = {
+  'venues': (VENUE_COLUMNS, True, _insert_venues),
+  'artists': (ARTIST_COLUMNS, True, _insert_artists),
+  'shows': (SHOW_COLUMNS, False, _insert_shows),
+}
+
+def run_import(kind, stream, format, source, batch_size=5000, report=None):
+  # returns (rows imported by this run, rows skipped because a previous run committed them)
+  columns, has_genres, insert_batch = KINDS[kind]
+  if has_genres:
+    # checked like the other columns, so a bad list names its record
+    columns = dict(columns, genres=_genres)
+  checkpoint = db.session.query(ImportCheckpoint).get(source)
+  if checkpoint is None:
+    checkpoint = ImportCheckpoint(source=source, kind=kind, rows_done=0)
+    db.session.add(checkpoint)
+  elif checkpoint.kind != kind:
+    raise ValueError('%s was previously imported as %s' % (source, checkpoint.kind))
+  skipped = checkpoint.rows_done
+
+  records = itertools.islice(read_records(stream, format), skipped, None)
+  imported = 0
+  started = time.perf_counter()
+  namespaces = set()
+  while True:
+    chunk = list(itertools.islice(records, batch_size))
+    if not chunk:
+      break
+    batch = []
+    for offset, record in enumerate(chunk):
+      batch.append(_clean(record, columns, skipped + imported + offset + 1))
+    try:
+      namespaces |= insert_batch(batch)
+      imported += len(batch)
+      checkpoint.rows_done = skipped + imported
+      checkpoint.updated_at = datetime.datetime.now()
+      db.session.commit()
+    except IntegrityError as error:
+      # a duplicate id or a dangling venue/artist reference; nothing of this batch is kept
+      db.session.rollback()
+      first = skipped + imported + 1
+      raise click.ClickException('records %d-%d: %s (fix the file and re-run to resume)'
+                                 % (first, first + len(batch) - 1, error.orig))
+    except:
+      db.session.rollback()
+      raise
+    if report:
+      report(skipped + imported, imported / (time.perf_counter() - started))
+
+  db.session.commit()
+  cache.invalidate(*sorted(namespaces))
+  return imported, skipped
@@ -0,0 +1,264 @@
+import bisect
+import collections
+import cProfile
+import functools
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from dbpool import pool_stats
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#
+# For every request this records the wall time (until the body has been
+# sent, so streamed pages count in full), the number and total time of SQL
+# statements and the time spent rendering templates. Requests slower than
+# SLOW_REQUEST_MS and statements slower than SLOW_QUERY_MS are logged, the
+# latter with their parameters. Totals per endpoint are served in the
+# Prometheus text format at /metrics, together with the connection pool
+# gauges of dbpool.py and those of gauge_sources (e.g. the job queue, see
+# jobs.py). Counters are per process: scrape every worker, or
+# run one worker per container.
+#
+# With PROFILE_SAMPLE_RATE > 0, that fraction of requests (to
+# PROFILE_ENDPOINTS, or all endpoints) runs under cProfile and is dumped to
+# PROFILE_DIR/<endpoint>-<time>-<pid>.prof for pstats or snakeviz.
+#
+# Requests answered by the async mode (asgi.py) are not recorded.
+#----------------------------------------------------------------------------#
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats(object):
+  def __init__(self, endpoint):
+    self.endpoint = endpoint
+    self.started = time.perf_counter()
+    self.sql_statements = 0
+    self.sql_time = 0.0
+    self.template_time = 0.0
+    self.profile = None
+
+
+def _current_stats():
+  return g.get('_request_stats') if has_request_context() else None
+
+
+class Metrics(object):
+  # per-process counters and histograms, rendered in the Prometheus text format
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._counters = collections.OrderedDict()
+    self._histograms = collections.OrderedDict()
+    self._help = {}
+
+  def describe(self, name, kind, text):
+    self._help[name] = (kind, text)
+
+  def inc(self, name, labels, value=1):
+    key = (name, tuple(sorted(labels.items())))
+    with self._lock:
+      self._counters[key] = self._counters.get(key, 0) + value
+
+  def observe(self, name, labels, value):
+    key = (name, tuple(sorted(labels.items())))
+    with self._lock:
+      histogram = self._histograms.get(key)
+      if histogram is None:
+        histogram = self._histograms[key] = [0] * len(DURATION_BUCKETS) + [0, 0.0]
+      index = bisect.bisect_left(DURATION_BUCKETS, value)
+      if index < len(DURATION_BUCKETS):
+        histogram[index] += 1
+      histogram[-2] += 1
+      histogram[-1] += value
+
+  def render(self, gauges=()):
+    lines = []
+    described = set()
+    def header(name):
+      if name not in described and name in self._help:
+        described.add(name)
+        kind, text = self._help[name]
+        lines.append('# HELP %s %s' % (name, text))
+        lines.append('# TYPE %s %s' % (name, kind))
+    with self._lock:
+      counters = list(self._counters.items())
+      histograms = [(key, list(values)) for key, values in self._histograms.items()]
+    for (name, labels), value in counters:
+      header(name)
+      lines.append('%s%s %s' % (name, _labels(labels), _number(value)))
+    for (name, labels), values in histograms:
+      header(name)
+      cumulative = 0
+      for bound, count in zip(DURATION_BUCKETS, values):
+        cumulative += count
+        lines.append('%s_bucket%s %d' % (name, _labels(labels + (('le', _number(bound)),)), cumulative))
+      lines.append('%s_bucket%s %d' % (name, _labels(labels + (('le', '+Inf'),)), values[-2]))
+      lines.append('%s_count%s %d' % (name, _labels(labels), values[-2]))
+      lines.append('%s_sum%s %s' % (name, _labels(labels), _number(values[-1])))
+    for name, labels, value in gauges:
+      header(name)
+      lines.append('%s%s %s' % (name, _labels(tuple(sorted(labels.items()))), _number(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+  if not labels:
+    return ''
+  return '{%s}' % ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                           for key, value in labels)
+
+def _number(value):
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class TimedTemplate(Template):
+  # adds render time, including streamed generation, to the current request
+  def render(self, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+      return super(TimedTemplate, self).render(*args, **kwargs)
+    finally:
+      _add_template_time(time.perf_counter() - started)
+
+  def generate(self, *args, **kwargs):
+    chunks = super(TimedTemplate, self).generate(*args, **kwargs)
+    while True:
+      started = time.perf_counter()
+      try:
+        chunk = next(chunks)
+      except StopIteration:
+        return
+      finally:
+        _add_template_time(time.perf_counter() - started)
+      yield chunk
+
+def _add_template_time(elapsed):
+  stats = _current_stats()
+  if stats is not None:
+    stats.template_time += elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  elapsed = time.perf_counter() - conn.info['query_started'].pop()
+  stats = _current_stats()
+  if stats is not None:
+    stats.sql_statements += 1
+    stats.sql_time += elapsed
+  if has_app_context():
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold and elapsed * 1000 >= threshold:
+      current_app.logger.warning('slow query (%.1f ms%s): %s; parameters: %r', elapsed * 1000,
+                                 ', %s' % stats.endpoint if stats else '', statement, parameters)
+
+def _handle_error(exception_context):
+  # a failed statement never reaches after_cursor_execute
+  started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+  if started:
+    started.pop()
+
+
+class Instrumentation(object):
+  def __init__(self, app=None):
+    self.logger = logging.getLogger(__name__)
+    self.metrics = Metrics()
+    self.metrics.describe('fyyur_requests_total', 'counter', 'Requests by endpoint, method and status.')
+    self.metrics.describe('fyyur_request_duration_seconds', 'histogram', 'Wall time per request, body included.')
+    self.metrics.describe('fyyur_sql_statements_total', 'counter', 'SQL statements issued by requests.')
+    self.metrics.describe('fyyur_sql_seconds_total', 'counter', 'Time spent in SQL statements by requests.')
+    self.metrics.describe('fyyur_template_seconds_total', 'counter', 'Time spent rendering templates by requests.')
+    self.metrics.describe('fyyur_slow_requests_total', 'counter', 'Requests slower than SLOW_REQUEST_MS.')
+    # callables returning (name, labels, value) gauges, read at each scrape
+    self.gauge_sources = []
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.logger = app.logger
+    app.jinja_env.template_class = TimedTemplate
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute),
+                           ('handle_error', _handle_error)):
+      if not event.contains(Engine, name, listener):
+        event.listen(Engine, name, listener)
+    app.before_request(self._before_request)
+    app.after_request(self._after_request)
+    if app.config.get('METRICS_ENABLED', True):
+      app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+    app.extensions['instrumentation'] = self
+
+  def _before_request(self):
+    stats = g._request_stats = RequestStats(request.endpoint or 'unmatched')
+    config = current_app.config
+    endpoints = config.get('PROFILE_ENDPOINTS')
+    if config.get('PROFILE_SAMPLE_RATE') and (not endpoints or stats.endpoint in endpoints) and \
+        random.random() < config['PROFILE_SAMPLE_RATE']:
+      stats.profile = cProfile.Profile()
+      try:
+        stats.profile.enable()
+      except ValueError:
+        # another profiler is already active in this thread
+        stats.profile = None
+
+  def _after_request(self, response):
+    stats = g.get('_request_stats')
+    if stats is not None:
+      # closing the response marks the end of the (possibly streamed) body
+      response.call_on_close(functools.partial(
+        self._finish, stats, request.method, response.status_code, current_app.config))
+    return response
+
+  def _finish(self, stats, method, status, config):
+    elapsed = time.perf_counter() - stats.started
+    if stats.profile is not None:
+      stats.profile.disable()
+      self._dump_profile(stats, config['PROFILE_DIR'])
+
+    labels = {'endpoint': stats.endpoint}
+    self.metrics.inc('fyyur_requests_total', dict(labels, method=method, status=status))
+    self.metrics.observe('fyyur_request_duration_seconds', labels, elapsed)
+    self.metrics.inc('fyyur_sql_statements_total', labels, stats.sql_statements)
+    self.metrics.inc('fyyur_sql_seconds_total', labels, stats.sql_time)
+    self.metrics.inc('fyyur_template_seconds_total', labels, stats.template_time)
+
+    threshold = config.get('SLOW_REQUEST_MS')
+    if threshold and elapsed * 1000 >= threshold:
+      self.metrics.inc('fyyur_slow_requests_total', labels)
+      self.logger.warning('slow request %s %s: %.1f ms, %d SQL statements in %.1f ms, templates %.1f ms',
+                          method, stats.endpoint, elapsed * 1000, stats.sql_statements, stats.sql_time * 1000,
+                          stats.template_time * 1000)
+
+  def _dump_profile(self, stats, directory):
+    try:
+      os.makedirs(directory, exist_ok=True)
+      path = os.path.join(directory, '%s-%d-%d.prof' % (stats.endpoint, time.time() * 1000, os.getpid()))
+      stats.profile.dump_stats(path)
+    except OSError:
+      self.logger.warning('could not write profile to %s', directory, exc_info=True)
+
+  def metrics_view(self):
+    return current_app.response_class(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+  def render_metrics(self):
+    # needs an app context
+    gauges = []
+    pool = pool_stats(current_app.extensions['sqlalchemy'].db.get_engine())
+    for key, value in sorted((pool or {}).items()):
+      gauges.append(('fyyur_db_pool_%s' % key, {}, value))
+    for source in self.gauge_sources:
+      try:
+        gauges.extend(source())
+      except Exception:
+        self.logger.warning('metrics gauge source %r failed', source, exc_info=True)
+    return self.metrics.render(gauges)
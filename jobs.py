@@ -0,0 +1,177 @@
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from flask import current_app
+from sqlalchemy import func, or_
+
+from config import cache, db
+from models import *
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#
+# Work that a write causes but that its response does not depend on (venue
+# stats, invalidating the pages of related venues and artists) is queued
+# with enqueue() in the write's own transaction, so a job exists exactly
+# when the write committed, and run later by `flask jobs work`. The queue is
+# the job table; no broker is needed.
+#
+# A worker claims one runnable job per transaction with SELECT ... FOR
+# UPDATE SKIP LOCKED, so any number of workers share the queue without
+# blocking each other, runs its handler and deletes it in the same
+# transaction. A failed job is retried with exponential backoff and parked
+# (failed_at) after JOBS_MAX_ATTEMPTS; `flask jobs retry` requeues those.
+# SQLite has no row locks and serializes writers: run one worker there.
+#
+# With JOBS_EMBEDDED_WORKER, each web process also runs a worker thread.
+# That is the setup for the per-process memory cache, whose pages only the
+# process itself can invalidate, and for local runs without a worker: with
+# that cache, enqueue() tags the job with its process (owner) and only that
+# process claims it, unless it has not done so for JOBS_OWNER_TIMEOUT
+# seconds (it stopped, and its cached pages with it).
+#
+# Handlers are registered with @job('kind') and called with the keyword
+# arguments given to enqueue(); they must be idempotent, as a job whose
+# worker dies before committing runs again. A handler may return a callable
+# to run once its transaction has committed, e.g. a cache invalidation.
+#----------------------------------------------------------------------------#
+
+handlers = {}
+
+def job(kind):
+  def decorator(function):
+    handlers[kind] = function
+    return function
+  return decorator
+
+def process_id():
+  # computed per call: forked workers get their own
+  return '%s:%d' % (socket.gethostname(), os.getpid())
+
+def enqueue(kind, **payload):
+  # adds the job to the current session; it is committed (or rolled back) with the caller's transaction
+  if kind not in handlers:
+    raise ValueError('no handler for job kind %r' % kind)
+  entry = Job(kind=kind, payload=json.dumps(payload, sort_keys=True),
+              owner=None if cache.backend.shared else process_id())
+  db.session.add(entry)
+  return entry
+
+
+def _backoff(attempts):
+  return datetime.timedelta(seconds=min(2 ** attempts, 300))
+
+def run_next(metrics=None, now=None):
+  # claims, runs and commits one runnable job; returns it, or None when the queue is empty
+  now = now or datetime.datetime.now()
+  orphaned = now - datetime.timedelta(seconds=current_app.config['JOBS_OWNER_TIMEOUT'])
+  entry = db.session.query(Job).filter(
+    Job.failed_at == None, Job.run_at <= now,
+    or_(Job.owner == None, Job.owner == process_id(), Job.run_at <= orphaned)).order_by(
+    Job.run_at, Job.id).limit(1).with_for_update(skip_locked=True).first()
+  if entry is None:
+    db.session.rollback()
+    return None
+
+  job_id, kind, created_at = entry.id, entry.kind, entry.created_at
+  started = time.perf_counter()
+  after_commit = None
+  try:
+    # a failing handler only rolls back to the savepoint, so the claim is
+    # still held while the failure is recorded
+    with db.session.begin_nested():
+      after_commit = handlers[kind](**json.loads(entry.payload))
+  except Exception:
+    error = traceback.format_exc()
+    current_app.logger.warning('job %d (%s) failed', job_id, kind, exc_info=True)
+    entry.attempts += 1
+    entry.last_error = error
+    if entry.attempts >= current_app.config['JOBS_MAX_ATTEMPTS']:
+      entry.failed_at = datetime.datetime.now()
+      outcome = 'failed'
+    else:
+      entry.run_at = datetime.datetime.now() + _backoff(entry.attempts)
+      outcome = 'retry'
+    db.session.commit()
+  else:
+    db.session.delete(entry)
+    db.session.commit()
+    outcome = 'ok'
+    if after_commit is not None:
+      after_commit()
+
+  if metrics is not None:
+    labels = {'kind': kind}
+    metrics.inc('fyyur_jobs_total', dict(labels, outcome=outcome))
+    metrics.observe('fyyur_job_run_seconds', labels, time.perf_counter() - started)
+    metrics.observe('fyyur_job_latency_seconds', labels, (datetime.datetime.now() - created_at).total_seconds())
+  return entry
+
+def work(metrics=None, once=False, idle_sleep=1.0, stop=None):
+  # runs jobs until stopped (or, with once, until the queue is empty); returns the number run
+  done = 0
+  while stop is None or not stop.is_set():
+    try:
+      entry = run_next(metrics)
+    except Exception:
+      # e.g. the database is unreachable; keep the worker alive
+      db.session.rollback()
+      current_app.logger.exception('job worker error')
+      entry = None
+    finally:
+      db.session.remove()
+    if entry is not None:
+      done += 1
+    elif once:
+      break
+    elif stop is not None:
+      stop.wait(idle_sleep)
+    else:
+      time.sleep(idle_sleep)
+  return done
+
+
+def queue_stats(now=None):
+  # runnable and parked jobs by kind, and the age of the oldest runnable job, in one query
+  now = now or datetime.datetime.now()
+  rows = db.session.query(Job.kind, Job.failed_at != None, func.count(Job.id), func.min(Job.created_at)).group_by(
+    Job.kind, Job.failed_at != None).all()
+  stats = {'queued': {}, 'failed': {}, 'oldest_age_seconds': 0.0}
+  for kind, failed, count, oldest in rows:
+    stats['failed' if failed else 'queued'][kind] = count
+    if not failed:
+      stats['oldest_age_seconds'] = max(stats['oldest_age_seconds'], (now - oldest).total_seconds())
+  return stats
+
+def queue_gauges():
+  # /metrics gauges, read from the table so they cover every worker
+  stats = queue_stats()
+  gauges = [('fyyur_jobs_queued', {'kind': kind}, count) for kind, count in sorted(stats['queued'].items())]
+  gauges += [('fyyur_jobs_failed', {'kind': kind}, count) for kind, count in sorted(stats['failed'].items())]
+  gauges.append(('fyyur_jobs_oldest_age_seconds', {}, stats['oldest_age_seconds']))
+  return gauges
+
+
+def describe_metrics(metrics):
+  metrics.describe('fyyur_jobs_total', 'counter', 'Jobs run by this process, by kind and outcome (ok, retry, failed).')
+  metrics.describe('fyyur_job_run_seconds', 'histogram', 'Time spent running a job handler.')
+  metrics.describe('fyyur_job_latency_seconds', 'histogram', 'Time from enqueue to the end of the job run.')
+  metrics.describe('fyyur_jobs_queued', 'gauge', 'Runnable and scheduled jobs, by kind.')
+  metrics.describe('fyyur_jobs_failed', 'gauge', 'Jobs parked after JOBS_MAX_ATTEMPTS, by kind.')
+  metrics.describe('fyyur_jobs_oldest_age_seconds', 'gauge', 'Age of the oldest job not yet run.')
+
+def start_embedded_worker(app, metrics=None):
+  # a daemon thread running jobs for this process; returns the event that stops it
+  stop = threading.Event()
+  def run():
+    with app.app_context():
+      work(metrics, idle_sleep=app.config['JOBS_POLL_INTERVAL'], stop=stop)
+  threading.Thread(target=run, name='fyyur-jobs', daemon=True).start()
+  logging.getLogger(__name__).info('embedded job worker started')
+  return stop
@@ -0,0 +1,48 @@
+from sqlalchemy import tuple_
+from sqlalchemy.dialects import postgresql
+
+from config import db
+from models import *
+
+#----------------------------------------------------------------------------#
+# Lookup tables.
+#
+# Venues reference the area row of their (city, state) and tag rows
+# reference genres by id. Writers resolve ids with area_ids() / genre_ids()
+# before inserting or updating; missing rows are created on the way. Rows
+# that are no longer referenced are left in place and skipped by the
+# listings.
+#----------------------------------------------------------------------------#
+
+def _lookup(table, columns, keys):
+  columns = [table.c[name] for name in columns]
+  key = columns[0] if len(columns) == 1 else tuple_(*columns)
+  values = [value[0] for value in keys] if len(columns) == 1 else list(keys)
+  return {tuple(row[1:]): row[0] for row in db.session.execute(
+    db.select([table.c.id] + columns).where(key.in_(values)))}
+
+def lookup_ids(table, columns, keys):
+  # returns {key tuple: id} for the given keys of a unique lookup table in at
+  # most three statements, inserting the missing ones
+  keys = set(keys)
+  found = _lookup(table, columns, keys) if keys else {}
+  missing = keys - set(found)
+  if missing:
+    insert = table.insert()
+    if db.session.get_bind().dialect.name == 'postgresql':
+      # another writer may create the same row concurrently
+      insert = postgresql.insert(table).on_conflict_do_nothing(index_elements=columns)
+    db.session.execute(insert, [dict(zip(columns, key)) for key in missing])
+    found.update(_lookup(table, columns, missing))
+  return found
+
+def area_ids(pairs):
+  # {(city, state): area id}
+  return lookup_ids(Area.__table__, ['city', 'state'], pairs)
+
+def area_id(city, state):
+  return area_ids([(city, state)])[(city, state)]
+
+def genre_ids(names):
+  # {name: genre id}
+  return {key[0]: value for key, value in lookup_ids(Genre.__table__, ['name'], ((name,) for name in names)).items()}
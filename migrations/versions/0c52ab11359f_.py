@@ -7,7 +7,7 @@ Create Date: 2020-11-08 16:43:37.640353
 """
 from alembic import op
 import sqlalchemy as sa
-import dateutil
+import dateutil.parser
 
 
 # revision identifiers, used by Alembic.
@@ -206,7 +206,7 @@ def upgrade():
     show_data=[{
     "venue_id": 1,
     "artist_id": 4,
-    "start_time": "2019-05-21T21:30:00.000Z"
+    "start_time": parse_date_string("2019-05-21T21:30:00.000Z")
     }, {
     "venue_id": 3,
     "artist_id": 5,
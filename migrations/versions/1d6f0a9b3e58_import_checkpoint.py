@@ -0,0 +1,30 @@
+"""import_checkpoint table for resumable bulk imports
+
+Revision ID: 1d6f0a9b3e58
+Revises: e5a0b8f27c64
+Create Date: 2026-10-18 14:52:11.078132
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d6f0a9b3e58'
+down_revision = 'e5a0b8f27c64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_checkpoint',
+    sa.Column('source', sa.String(length=500), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('import_checkpoint')
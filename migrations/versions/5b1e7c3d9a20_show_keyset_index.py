@@ -0,0 +1,24 @@
+"""index show(start_time, id) for keyset pagination
+
+Revision ID: 5b1e7c3d9a20
+Revises: 0c52ab11359f
+Create Date: 2026-10-18 09:12:44.215031
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c3d9a20'
+down_revision = '0c52ab11359f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
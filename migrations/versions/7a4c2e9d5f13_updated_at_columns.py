@@ -0,0 +1,34 @@
+"""updated_at on venue, artist and show for conditional GETs
+
+Revision ID: 7a4c2e9d5f13
+Revises: 1d6f0a9b3e58
+Create Date: 2026-10-18 16:08:39.442716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c2e9d5f13'
+down_revision = '1d6f0a9b3e58'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venue', 'artist', 'show')
+
+
+def upgrade():
+    now = datetime.datetime.now()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        # SQLite cannot add a column with a non-constant default, so backfill instead
+        op.execute(sa.table(table, sa.column('updated_at')).update().values(updated_at=now))
+        op.create_index(op.f('ix_%s_updated_at' % table), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(op.f('ix_%s_updated_at' % table), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,36 @@
+"""job table for the background job queue
+
+Revision ID: a9d3e6f2b871
+Revises: e5b2c9a7d134
+Create Date: 2026-10-18 20:11:05.402719
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e6f2b871'
+down_revision = 'e5b2c9a7d134'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('failed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_failed_at_run_at', 'job', ['failed_at', 'run_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_failed_at_run_at', table_name='job')
+    op.drop_table('job')
@@ -0,0 +1,29 @@
+"""updated_at on venue_stats for the /venues ETag
+
+Revision ID: b4e8d2a6c913
+Revises: f1c6b2d8e407
+Create Date: 2026-10-18 21:24:41.906512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8d2a6c913'
+down_revision = 'f1c6b2d8e407'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue_stats', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # SQLite cannot add a column with a non-constant default, so backfill instead
+    op.execute(sa.table('venue_stats', sa.column('updated_at')).update().values(updated_at=datetime.datetime.now()))
+    op.create_index(op.f('ix_venue_stats_updated_at'), 'venue_stats', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_venue_stats_updated_at'), table_name='venue_stats')
+    op.drop_column('venue_stats', 'updated_at')
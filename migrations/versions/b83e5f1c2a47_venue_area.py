@@ -0,0 +1,52 @@
+"""area table of distinct (city, state) pairs referenced by venue
+
+Revision ID: b83e5f1c2a47
+Revises: 7a4c2e9d5f13
+Create Date: 2026-10-18 17:02:51.906137
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83e5f1c2a47'
+down_revision = '7a4c2e9d5f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('area',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_area_state_city', 'area', ['state', 'city'], unique=True)
+
+    with op.batch_alter_table('venue') as batch_op:
+        batch_op.add_column(sa.Column('area_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_venue_area_id_area', 'area', ['area_id'], ['id'])
+
+    op.execute("""
+    INSERT INTO area (city, state)
+    SELECT DISTINCT city, state FROM venue
+    """)
+    op.execute("""
+    UPDATE venue SET area_id = (
+      SELECT area.id FROM area WHERE area.city = venue.city AND area.state = venue.state)
+    """)
+
+    with op.batch_alter_table('venue') as batch_op:
+        batch_op.alter_column('area_id', existing_type=sa.Integer(), nullable=False)
+    op.create_index(op.f('ix_venue_area_id'), 'venue', ['area_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_venue_area_id'), table_name='venue')
+    with op.batch_alter_table('venue') as batch_op:
+        batch_op.drop_constraint('fk_venue_area_id_area', type_='foreignkey')
+        batch_op.drop_column('area_id')
+    op.drop_index('ix_area_state_city', table_name='area')
+    op.drop_table('area')
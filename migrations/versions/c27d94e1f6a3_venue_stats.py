@@ -0,0 +1,42 @@
+"""venue_stats aggregate of upcoming shows per venue
+
+Revision ID: c27d94e1f6a3
+Revises: 8f3a6d2c41b7
+Create Date: 2026-10-18 11:40:05.318906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27d94e1f6a3'
+down_revision = '8f3a6d2c41b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('venue_stats',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('upcoming_shows', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('next_show_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index(op.f('ix_venue_stats_next_show_time'), 'venue_stats', ['next_show_time'], unique=False)
+
+    # backfill from the current show table; the app stores naive local times
+    op.get_bind().execute(sa.text("""
+    INSERT INTO venue_stats (venue_id, upcoming_shows, next_show_time)
+    SELECT venue.id, count(show.id), min(show.start_time)
+    FROM venue LEFT OUTER JOIN show
+      ON show.venue_id = venue.id AND show.start_time > :now
+    GROUP BY venue.id
+    """), now=datetime.datetime.now())
+
+
+def downgrade():
+    op.drop_index(op.f('ix_venue_stats_next_show_time'), table_name='venue_stats')
+    op.drop_table('venue_stats')
@@ -0,0 +1,31 @@
+"""deletion table replacing row counts in the list ETags
+
+Revision ID: c5a1f7e3b290
+Revises: b4e8d2a6c913
+Create Date: 2026-10-18 21:47:12.230861
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a1f7e3b290'
+down_revision = 'b4e8d2a6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    deletion = op.create_table('deletion',
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    now = datetime.datetime.now()
+    op.bulk_insert(deletion, [{'table_name': 'venue', 'deleted_at': now}, {'table_name': 'artist', 'deleted_at': now}])
+
+
+def downgrade():
+    op.drop_table('deletion')
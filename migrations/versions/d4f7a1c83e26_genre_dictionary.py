@@ -0,0 +1,74 @@
+"""genre dictionary table, genre tags keyed by genre_id
+
+Revision ID: d4f7a1c83e26
+Revises: b83e5f1c2a47
+Create Date: 2026-10-18 17:48:12.530418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7a1c83e26'
+down_revision = 'b83e5f1c2a47'
+branch_labels = None
+depends_on = None
+
+GENRE_ID = sa.SmallInteger().with_variant(sa.Integer(), 'sqlite')
+TAG_TABLES = (('venue_genre_tags', 'venue_id', 'venue'), ('artist_genre_tags', 'artist_id', 'artist'))
+
+
+def _set_aside(table):
+    # the replacement is created under the same name, so move the old table
+    # and (on Postgres, where index names are schema-wide) its primary key out of the way
+    op.rename_table(table, table + '_old')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER INDEX %s_pkey RENAME TO %s_old_pkey' % (table, table))
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', GENRE_ID, nullable=False),
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.execute("""
+    INSERT INTO genre (name)
+    SELECT genre FROM venue_genre_tags UNION SELECT genre FROM artist_genre_tags
+    """)
+
+    for table, owner_column, owner_table in TAG_TABLES:
+        _set_aside(table)
+        op.create_table(table,
+        sa.Column(owner_column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', GENRE_ID, nullable=False),
+        sa.ForeignKeyConstraint([owner_column], ['%s.id' % owner_table], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.PrimaryKeyConstraint(owner_column, 'genre_id')
+        )
+        op.execute("""
+        INSERT INTO {table} ({owner}, genre_id)
+        SELECT tag.{owner}, genre.id FROM {table}_old AS tag JOIN genre ON genre.name = tag.genre
+        """.format(table=table, owner=owner_column))
+        op.drop_table(table + '_old')
+        op.create_index('ix_%s_genre_id_%s' % (table, owner_column), table, ['genre_id', owner_column], unique=False)
+
+
+def downgrade():
+    for table, owner_column, owner_table in TAG_TABLES:
+        op.drop_index('ix_%s_genre_id_%s' % (table, owner_column), table_name=table)
+        _set_aside(table)
+        op.create_table(table,
+        sa.Column(owner_column, sa.Integer(), nullable=False),
+        sa.Column('genre', sa.String(length=20), nullable=False),
+        sa.ForeignKeyConstraint([owner_column], ['%s.id' % owner_table], ),
+        sa.PrimaryKeyConstraint(owner_column, 'genre')
+        )
+        op.execute("""
+        INSERT INTO {table} ({owner}, genre)
+        SELECT tag.{owner}, genre.name FROM {table}_old AS tag JOIN genre ON genre.id = tag.genre_id
+        """.format(table=table, owner=owner_column))
+        op.drop_table(table + '_old')
+    op.drop_table('genre')
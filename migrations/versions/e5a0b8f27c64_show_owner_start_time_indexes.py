@@ -0,0 +1,26 @@
+"""composite indexes on show(venue_id, start_time) and show(artist_id, start_time)
+
+Revision ID: e5a0b8f27c64
+Revises: c27d94e1f6a3
+Create Date: 2026-10-18 13:21:50.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a0b8f27c64'
+down_revision = 'c27d94e1f6a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time', 'artist_id'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time', 'venue_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -0,0 +1,83 @@
+"""show end_time, overlap exclusion constraints on Postgres
+
+Revision ID: e5b2c9a7d134
+Revises: d4f7a1c83e26
+Create Date: 2026-10-18 19:02:41.118305
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2c9a7d134'
+down_revision = 'd4f7a1c83e26'
+branch_labels = None
+depends_on = None
+
+DEFAULT_HOURS = 3
+OVERLAP_CONSTRAINTS = (('ex_show_venue_overlap', 'venue_id'), ('ex_show_artist_overlap', 'artist_id'))
+
+
+def _backfill_python(bind):
+    # same as the Postgres statement below, for dialects without interval arithmetic
+    show = sa.table('show', sa.column('id', sa.Integer), sa.column('venue_id', sa.Integer),
+                    sa.column('artist_id', sa.Integer), sa.column('start_time', sa.DateTime),
+                    sa.column('end_time', sa.DateTime))
+    rows = bind.execute(sa.select([show.c.id, show.c.venue_id, show.c.artist_id, show.c.start_time])).fetchall()
+    ends = {row.id: row.start_time + datetime.timedelta(hours=DEFAULT_HOURS) for row in rows}
+    for owner in ('venue_id', 'artist_id'):
+        ordered = sorted((row for row in rows if row[owner] is not None),
+                         key=lambda row: (row[owner], row.start_time, row.id))
+        for row, following in zip(ordered, ordered[1:]):
+            if row[owner] == following[owner]:
+                ends[row.id] = min(ends[row.id], following.start_time)
+    for id, end_time in ends.items():
+        bind.execute(show.update().where(show.c.id == id).values(end_time=end_time))
+
+
+def upgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('show', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    # existing shows last the default three hours, cut short where the venue
+    # or the artist already has a later show booked inside that window
+    if bind.dialect.name == 'postgresql':
+        op.execute("""
+        UPDATE show SET end_time = bounds.end_time
+        FROM (
+          SELECT id, LEAST(start_time + interval '%d hours',
+                           LEAD(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id),
+                           LEAD(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id)) AS end_time
+          FROM show
+        ) AS bounds
+        WHERE show.id = bounds.id
+        """ % DEFAULT_HOURS)
+    else:
+        _backfill_python(bind)
+
+    with op.batch_alter_table('show', schema=None) as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_show_end_time', 'end_time >= start_time')
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for name, owner_column in OVERLAP_CONSTRAINTS:
+            op.execute("ALTER TABLE show ADD CONSTRAINT %s EXCLUDE USING gist "
+                       "(%s WITH =, tsrange(start_time, end_time, '[)') WITH &&)" % (name, owner_column))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for name, _ in OVERLAP_CONSTRAINTS:
+            op.execute('ALTER TABLE show DROP CONSTRAINT %s' % name)
+    with op.batch_alter_table('show', schema=None) as batch_op:
+        if dialect != 'sqlite':
+            # SQLite's batch copy does not reflect check constraints, so the
+            # recreated table leaves it out anyway
+            batch_op.drop_constraint('ck_show_end_time', type_='check')
+        batch_op.drop_column('end_time')
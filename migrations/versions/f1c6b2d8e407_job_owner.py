@@ -0,0 +1,24 @@
+"""owner of jobs that must run in the process that queued them
+
+Revision ID: f1c6b2d8e407
+Revises: a9d3e6f2b871
+Create Date: 2026-10-18 21:02:17.518340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6b2d8e407'
+down_revision = 'a9d3e6f2b871'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('job', sa.Column('owner', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    op.drop_column('job', 'owner')
@@ -1,54 +1,118 @@
-from flask import Flask
-from flask_moment import Moment
+import datetime
+from sqlalchemy import DDL, event
 from config import *
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+class Area(db.Model):
+  # distinct (city, state) pairs that venues are grouped by on /venues, see lookups.py
+  __tablename__ = 'area'
+  __table_args__ = (
+    db.Index('ix_area_state_city', 'state', 'city', unique=True),
+  )
+
+  id = db.Column(db.Integer, primary_key = True)
+  city = db.Column(db.String(120), nullable = False)
+  state = db.Column(db.String(120), nullable = False)
+
+  venues = db.relationship('Venue', backref='area')
+
+  def __repr__(self):
+    return f'{self.id, self.city, self.state}'
+
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        # trigram index backing name search on Postgres
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable = False)
     address = db.Column(db.String(120), nullable = False)
     city = db.Column(db.String(120), nullable = False)
     state = db.Column(db.String(120), nullable = False)
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), nullable = False, index = True)
     phone = db.Column(db.String(120), nullable = False)
-    website = db.Column(db.String(120), nullable = True)
-    facebook_link = db.Column(db.String, nullable = True)
+    website = db.deferred(db.Column(db.String(120), nullable = True), group = 'profile')
+    facebook_link = db.deferred(db.Column(db.String, nullable = True), group = 'profile')
     seeking_talent = db.Column(db.Boolean, nullable = False)
-    seeking_description = db.Column(db.String, nullable = True)
-    image_link = db.Column(db.String(500), nullable = True)
+    seeking_description = db.deferred(db.Column(db.String, nullable = True), group = 'profile')
+    image_link = db.deferred(db.Column(db.String(500), nullable = True), group = 'profile')
+    updated_at = db.Column(db.DateTime, nullable = True, index = True, default = datetime.datetime.now, onupdate = datetime.datetime.now)
+    # the 'profile' columns (free text and links) are only loaded by the views
+    # that render them: undefer_group('profile') or select them as columns
 
-    genres = db.relationship('GenreTagsForVenues', backref='venue')
+    genres = db.relationship('GenreTagsForVenues', backref='venue', cascade='all, delete-orphan')
     shows = db.relationship('Show', backref='venue')
+    stats = db.relationship('VenueStats', backref='venue', uselist=False, cascade='all, delete-orphan')
     
 
 # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
+# SQLite only autoincrements INTEGER primary keys
+GENRE_ID = db.SmallInteger().with_variant(db.Integer(), 'sqlite')
+
+class Genre(db.Model):
+  # genre dictionary; tag tables reference it by id, see lookups.py
+  __tablename__ = 'genre'
+
+  id = db.Column(GENRE_ID, primary_key = True)
+  name = db.Column(db.String(20), nullable = False, unique = True)
+
+  def __repr__(self):
+    return f'{self.name}'
+
 class GenreTagsForVenues(db.Model):
   __tablename__ = 'venue_genre_tags'
+  __table_args__ = (
+    # genre browse: all venues with a genre
+    db.Index('ix_venue_genre_tags_genre_id_venue_id', 'genre_id', 'venue_id'),
+  )
 
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), primary_key = True)
-  genre = db.Column(db.String(20), primary_key = True)
+  genre_id = db.Column(GENRE_ID, db.ForeignKey('genre.id'), primary_key = True)
+
+  genre = db.relationship('Genre', lazy = 'joined')
 
   def __repr__(self):
+    # the edit forms populate their genre choices from str(tag)
     return f'{self.genre}'
 
+class VenueStats(db.Model):
+  # maintained aggregate read by /venues, see stats.py
+  __tablename__ = 'venue_stats'
+
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), primary_key = True)
+  upcoming_shows = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+  next_show_time = db.Column(db.DateTime, nullable = True, index = True)
+  # set by every refresh (onupdate), so the /venues ETag follows the counts
+  updated_at = db.Column(db.DateTime, nullable = True, index = True, default = datetime.datetime.now, onupdate = datetime.datetime.now)
+
+  def __repr__(self):
+    return f'{self.venue_id, self.upcoming_shows, self.next_show_time}'
+
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        # trigram index backing name search on Postgres
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable = False)
     city = db.Column(db.String(120), nullable = False)
     state = db.Column(db.String(120), nullable = False)
     phone = db.Column(db.String(120), nullable = False)
-    image_link = db.Column(db.String(500), nullable = True)
-    facebook_link = db.Column(db.String(120), nullable = True)
-    website = db.Column(db.String, nullable = True)
+    image_link = db.deferred(db.Column(db.String(500), nullable = True), group = 'profile')
+    facebook_link = db.deferred(db.Column(db.String(120), nullable = True), group = 'profile')
+    website = db.deferred(db.Column(db.String, nullable = True), group = 'profile')
     seeking_venue = db.Column(db.Boolean, nullable = False)
-    seeking_description = db.Column(db.String, nullable = True)
+    seeking_description = db.deferred(db.Column(db.String, nullable = True), group = 'profile')
+    updated_at = db.Column(db.DateTime, nullable = True, index = True, default = datetime.datetime.now, onupdate = datetime.datetime.now)
+    # see Venue for the 'profile' group
 
     genres = db.relationship('GenreTagsForArtists', backref='artist', cascade = 'all, delete-orphan')
     shows = db.relationship('Show', backref='artist')
@@ -58,20 +122,121 @@ class Artist(db.Model):
 
 class GenreTagsForArtists(db.Model):
   __tablename__ = 'artist_genre_tags'
+  __table_args__ = (
+    # genre browse: all artists with a genre
+    db.Index('ix_artist_genre_tags_genre_id_artist_id', 'genre_id', 'artist_id'),
+  )
 
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), primary_key = True)
-  genre = db.Column(db.String(20), primary_key = True)
-  
+  genre_id = db.Column(GENRE_ID, db.ForeignKey('genre.id'), primary_key = True)
+
+  genre = db.relationship('Genre', lazy = 'joined')
+
   def __repr__(self):
     return f'{self.genre}'
 
+# Shows occupy [start_time, end_time). Without an end time they last
+# DEFAULT_SHOW_DURATION; no show lasts longer than MAX_SHOW_DURATION, which
+# bounds the index range scanned by overlap checks (see schedule.py).
+DEFAULT_SHOW_DURATION = datetime.timedelta(hours=3)
+MAX_SHOW_DURATION = datetime.timedelta(hours=24)
+
+def _default_end_time(context):
+  return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+
 class Show(db.Model):
   __tablename__ = 'show'
+  __table_args__ = (
+    # keyset pagination order for /shows
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    # detail pages and venue_stats: filter on the owner, range on start_time,
+    # with the other side of the join included so the show lookup is index-only
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time', 'artist_id'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time', 'venue_id'),
+    db.CheckConstraint('end_time >= start_time', name='ck_show_end_time'),
+    # on Postgres, SHOW_OVERLAP_CONSTRAINTS below reject overlapping bookings
+  )
   
   id = db.Column(db.Integer, primary_key=True)
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'))
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'))
   start_time = db.Column(db.DateTime, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False, default=_default_end_time)
+  updated_at = db.Column(db.DateTime, nullable=True, index=True, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+
+  def __repr__(self):
+    return f'{self.id, self.artist_id, self.venue_id, self.start_time}'
+
+# GiST exclusion constraints: no two shows of a venue (or of an artist) may
+# overlap. Postgres only; elsewhere schedule.py's indexed interval query is
+# the only check. Created by migration e5b2c9a7d134 and by create_all().
+SHOW_OVERLAP_CONSTRAINTS = {
+  'ex_show_venue_overlap': 'venue_id',
+  'ex_show_artist_overlap': 'artist_id',
+}
+
+def show_overlap_ddl(name, owner_column):
+  return ("ALTER TABLE show ADD CONSTRAINT %s EXCLUDE USING gist "
+          "(%s WITH =, tsrange(start_time, end_time, '[)') WITH &&)" % (name, owner_column))
+
+event.listen(Show.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+for _name, _owner_column in SHOW_OVERLAP_CONSTRAINTS.items():
+  event.listen(Show.__table__, 'after_create', DDL(show_overlap_ddl(_name, _owner_column)).execute_if(dialect='postgresql'))
+
+class Job(db.Model):
+  # deferred side-effect work, enqueued in the transaction of the write that
+  # caused it and run by `flask jobs work` (see jobs.py)
+  __tablename__ = 'job'
+  __table_args__ = (
+    # the dequeue scan: runnable jobs in run_at order
+    db.Index('ix_job_failed_at_run_at', 'failed_at', 'run_at'),
+  )
+
+  id = db.Column(db.Integer, primary_key = True)
+  kind = db.Column(db.String(50), nullable = False)
+  payload = db.Column(db.Text, nullable = False, default = '{}')
+  created_at = db.Column(db.DateTime, nullable = False, default = datetime.datetime.now)
+  run_at = db.Column(db.DateTime, nullable = False, default = datetime.datetime.now)
+  attempts = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+  last_error = db.Column(db.Text, nullable = True)
+  # set once attempts reach JOBS_MAX_ATTEMPTS; such jobs are kept for `flask jobs retry`
+  failed_at = db.Column(db.DateTime, nullable = True)
+  # host:pid of the process that must run the job, set when the response
+  # cache is per process (see jobs.py); NULL lets any worker claim it
+  owner = db.Column(db.String(100), nullable = True)
+
+  def __repr__(self):
+    return f'{self.id, self.kind, self.attempts}'
+
+class ImportCheckpoint(db.Model):
+  # progress of `flask import`, committed with each batch so imports can resume
+  __tablename__ = 'import_checkpoint'
+
+  source = db.Column(db.String(500), primary_key = True)
+  kind = db.Column(db.String(20), nullable = False)
+  rows_done = db.Column(db.Integer, nullable = False, default = 0)
+  updated_at = db.Column(db.DateTime, nullable = True)
+
+  def __repr__(self):
+    return f'{self.source, self.kind, self.rows_done}'
+
+class Deletion(db.Model):
+  # when rows of a table were last deleted through the ORM; the list ETags
+  # read this instead of counting the table (see queries.py)
+  __tablename__ = 'deletion'
+
+  table_name = db.Column(db.String(50), primary_key = True)
+  deleted_at = db.Column(db.DateTime, nullable = False)
 
   def __repr__(self):
-    return f'{self.id, self.artist_id, self.venue_id, self.start_time}'
\ No newline at end of file
+    return f'{self.table_name, self.deleted_at}'
+
+def record_deletion(mapper, connection, target):
+  table = Deletion.__table__
+  name, now = mapper.local_table.name, datetime.datetime.now()
+  if not connection.execute(table.update().where(table.c.table_name == name).values(deleted_at=now)).rowcount:
+    connection.execute(table.insert().values(table_name=name, deleted_at=now))
+
+for _model in (Venue, Artist):
+  event.listen(_model, 'after_delete', record_deletion)
@@ -0,0 +1,291 @@
+import collections
+import datetime
+
+from sqlalchemy import case, func, tuple_
+from sqlalchemy.orm import joinedload, undefer_group
+
+from config import db
+from models import *
+from utils import encode_cursor
+
+#----------------------------------------------------------------------------#
+# Page loaders.
+#
+# Each loader returns the template context for one page in a fixed number of
+# statements, independent of how many genres or shows the entity has. The
+# HTML views and the JSON API (api.py) share them. Read-only pages select
+# only the columns they render and get plain row tuples back, so nothing
+# enters the session's identity map.
+#----------------------------------------------------------------------------#
+
+SHOW_WINDOWS = ('all', 'upcoming', 'past')
+
+VENUE_PAGE_COLUMNS = (Venue.id, Venue.name, Venue.address, Venue.city, Venue.state, Venue.phone, Venue.website,
+                      Venue.facebook_link, Venue.seeking_talent, Venue.seeking_description, Venue.image_link)
+ARTIST_PAGE_COLUMNS = (Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.website,
+                       Artist.facebook_link, Artist.seeking_venue, Artist.seeking_description, Artist.image_link)
+
+def _with_genre(owner_key, tag_model, tag_owner_key, genre):
+  # ids come from the (genre_id, owner_id) index of the tag table
+  return owner_key.in_(db.session.query(tag_owner_key).join(Genre, Genre.id == tag_model.genre_id).filter(
+    Genre.name == genre))
+
+def venue_list(genre=None):
+  # upcoming show counts are maintained in venue_stats, see stats.py
+  query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.area_id,
+                           VenueStats.upcoming_shows).outerjoin(VenueStats)
+  if genre:
+    query = query.filter(_with_genre(Venue.id, GenreTagsForVenues, GenreTagsForVenues.venue_id, genre))
+  return query
+
+def venue_data(row):
+  return {
+    "id": row.id,
+    "name": row.name,
+    "num_upcoming_shows": row.upcoming_shows or 0
+  }
+
+def venue_areas(after=None, page_size=20, genre=None):
+  # one page of areas ordered by (state, city), each with its venues (only
+  # those tagged `genre` if given), in two statements; returns the areas and
+  # the (state, city) to continue after
+  query = db.session.query(Area.id, Area.city, Area.state).filter(Area.venues.any(
+    _with_genre(Venue.id, GenreTagsForVenues, GenreTagsForVenues.venue_id, genre) if genre else None))
+  if after:
+    query = query.filter(tuple_(Area.state, Area.city) > tuple(after))
+  areas = query.order_by(Area.state, Area.city).limit(page_size + 1).all()
+  next_after = None
+  if len(areas) > page_size:
+    areas = areas[:page_size]
+    next_after = (areas[-1].state, areas[-1].city)
+
+  venues = collections.defaultdict(list)
+  for row in venue_list(genre).filter(Venue.area_id.in_([area.id for area in areas])).order_by(Venue.id):
+    venues[row.area_id].append(venue_data(row))
+  return [{'city': area.city, 'state': area.state, 'venues': venues[area.id]} for area in areas], next_after
+
+def artist_list(genre=None):
+  query = db.session.query(Artist.id, Artist.name)
+  if genre:
+    query = query.filter(_with_genre(Artist.id, GenreTagsForArtists, GenreTagsForArtists.artist_id, genre))
+  return query
+
+def show_data(row):
+  return {
+    "venue_id": row.venue_id,
+    "venue_name": row.venue_name,
+    "artist_id": row.artist_id,
+    "artist_name": row.artist_name,
+    "artist_image_link": row.image_link,
+    "start_time": row.start_time,
+    "end_time": row.end_time
+  }
+
+def shows_page(window='all', start=None, end=None, cursor=None, page_size=30):
+  # one keyset page of shows ordered by (start_time, id), newest first for
+  # window='past'; returns the rows and the opaque cursor of the next page
+  query = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time,
+                           Venue.name.label('venue_name'), Artist.name.label('artist_name'),
+                           Artist.image_link).join(Venue).join(Artist)
+  now = datetime.datetime.now()
+  if window == 'upcoming':
+    query = query.filter(Show.start_time >= now)
+  elif window == 'past':
+    query = query.filter(Show.start_time < now)
+  if start:
+    query = query.filter(Show.start_time >= start)
+  if end:
+    query = query.filter(Show.start_time < end)
+
+  descending = window == 'past'
+  keyset = tuple_(Show.start_time, Show.id)
+  if cursor:
+    query = query.filter(keyset < cursor if descending else keyset > cursor)
+  if descending:
+    query = query.order_by(Show.start_time.desc(), Show.id.desc())
+  else:
+    query = query.order_by(Show.start_time, Show.id)
+
+  rows = query.limit(page_size + 1).all()
+  if len(rows) <= page_size:
+    return rows, None
+  rows = rows[:page_size]
+  return rows, encode_cursor(rows[-1].start_time, rows[-1].id)
+
+def _partition_shows(rows, show_data):
+  # rows are ordered by start_time, so past shows form a prefix
+  now = datetime.datetime.now()
+  past_shows, upcoming_shows = [], []
+  for row in rows:
+    (past_shows if row.start_time < now else upcoming_shows).append(show_data(row))
+  return past_shows, upcoming_shows
+
+def venue_shows(venue_id):
+  return db.session.query(Artist.id, Artist.name, Artist.image_link, Show.start_time).join(
+    Show, Show.artist_id == Artist.id).filter(Show.venue_id == venue_id).order_by(Show.start_time)
+
+def venue_page(venue, genres, rows):
+  # venue is anything with the venue's column attributes (model or row)
+  past_shows, upcoming_shows = _partition_shows(rows, lambda row: {
+    "artist_id": row.id,
+    "artist_name": row.name,
+    "artist_image_link": row.image_link,
+    "start_time": row.start_time
+  })
+
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+
+def _owner_rows(columns, tag_model, tag_owner_key, owner_id):
+  # the owner's page columns once per genre tag (once, with genre None, if untagged)
+  return db.session.query(*columns, Genre.name.label('genre')).outerjoin(
+    tag_model, tag_owner_key == columns[0]).outerjoin(Genre, Genre.id == tag_model.genre_id).filter(
+    columns[0] == owner_id).all()
+
+def venue_detail(venue_id):
+  # two statements: venue columns joined with its genres, then all of its shows
+  rows = _owner_rows(VENUE_PAGE_COLUMNS, GenreTagsForVenues, GenreTagsForVenues.venue_id, venue_id)
+  if not rows:
+    return None
+  return venue_page(rows[0], [row.genre for row in rows if row.genre], venue_shows(venue_id))
+
+def artist_shows(artist_id):
+  return db.session.query(Venue.id, Venue.name, Venue.image_link, Show.start_time).join(
+    Show, Show.venue_id == Venue.id).filter(Show.artist_id == artist_id).order_by(Show.start_time)
+
+def artist_page(artist, genres, rows):
+  # artist is anything with the artist's column attributes (model or row)
+  past_shows, upcoming_shows = _partition_shows(rows, lambda row: {
+    "venue_id": row.id,
+    "venue_name": row.name,
+    "venue_image_link": row.image_link,
+    "start_time": row.start_time
+  })
+
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+
+def artist_detail(artist_id):
+  # two statements: artist columns joined with its genres, then all of its shows
+  rows = _owner_rows(ARTIST_PAGE_COLUMNS, GenreTagsForArtists, GenreTagsForArtists.artist_id, artist_id)
+  if not rows:
+    return None
+  return artist_page(rows[0], [row.genre for row in rows if row.genre], artist_shows(artist_id))
+
+#----------------------------------------------------------------------------#
+# Edit forms.
+#
+# The edit forms need ORM objects (WTForms reads the genres relationship to
+# preselect them), loaded with every profile column and genre in one
+# statement.
+#----------------------------------------------------------------------------#
+
+def venue_for_edit(venue_id):
+  return db.session.query(Venue).options(undefer_group('profile'), joinedload(Venue.genres)).filter(
+    Venue.id == venue_id).one_or_none()
+
+def artist_for_edit(artist_id):
+  return db.session.query(Artist).options(undefer_group('profile'), joinedload(Artist.genres)).filter(
+    Artist.id == artist_id).one_or_none()
+
+#----------------------------------------------------------------------------#
+# Validators.
+#
+# Cheap fingerprints of everything a page renders, used for ETags before any
+# of the page's own queries run (see utils.conditional). Each is a single
+# statement answered from the updated_at / start_time indexes where it
+# matters; deletions are tracked in the deletion table rather than by
+# counting rows. Pages split by "now" also include the next upcoming start_time,
+# which changes exactly when a show moves into the past.
+#----------------------------------------------------------------------------#
+
+Validator = collections.namedtuple('Validator', ['last_modified', 'fingerprint'])
+
+def _validator(row, timestamps):
+  # row is the fingerprint; its first `timestamps` columns are updated_at values
+  if row is None:
+    return None
+  modified = [value for value in row[:timestamps] if value is not None]
+  return Validator(max(modified) if modified else None, tuple(row))
+
+def _owner_validator_query(owner, owner_key, other, other_key, owner_id):
+  now = datetime.datetime.now()
+  return db.session.query(
+    owner.updated_at, func.max(Show.updated_at), func.max(other.updated_at), func.count(Show.id),
+    func.min(case([(Show.start_time >= now, Show.start_time)]))
+  ).outerjoin(Show, owner_key == owner.id).outerjoin(other, other.id == other_key).filter(
+    owner.id == owner_id).group_by(owner.id, owner.updated_at)
+
+def venue_validator_query(venue_id):
+  return _owner_validator_query(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+def artist_validator_query(artist_id):
+  return _owner_validator_query(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+def owner_validator(row):
+  # turns a row of venue_validator_query / artist_validator_query into a Validator
+  return _validator(row, 3)
+
+def venue_validator(venue_id):
+  return owner_validator(venue_validator_query(venue_id).first())
+
+def artist_validator(artist_id):
+  return owner_validator(artist_validator_query(artist_id).first())
+
+def _deleted_at(table_name):
+  # stands in for a row count: changes when a row is deleted, and is a primary key lookup
+  return db.session.query(Deletion.deleted_at).filter(Deletion.table_name == table_name).as_scalar()
+
+def venues_validator():
+  # the counts come from venue_stats, which a job refreshes after the show
+  # was saved, so its own updated_at is part of the fingerprint
+  return _validator(db.session.query(
+    db.session.query(func.max(Venue.updated_at)).as_scalar(),
+    db.session.query(func.max(Show.updated_at)).as_scalar(),
+    db.session.query(func.max(VenueStats.updated_at)).as_scalar(),
+    _deleted_at('venue'),
+    db.session.query(func.min(VenueStats.next_show_time)).as_scalar()).one(), 4)
+
+def artists_validator():
+  return _validator(db.session.query(
+    db.session.query(func.max(Artist.updated_at)).as_scalar(),
+    _deleted_at('artist')).one(), 2)
+
+def shows_validator():
+  now = datetime.datetime.now()
+  return _validator(db.session.query(
+    db.session.query(func.max(Show.updated_at)).as_scalar(),
+    db.session.query(func.max(Venue.updated_at)).as_scalar(),
+    db.session.query(func.max(Artist.updated_at)).as_scalar(),
+    db.session.query(func.min(Show.start_time)).filter(Show.start_time >= now).as_scalar()).one(), 3)
@@ -0,0 +1,146 @@
+import functools
+import itertools
+import math
+import time
+
+from flask import current_app, g, request, session
+
+from dbpool import pool_stats
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# SQLALCHEMY_REPLICA_URIS become the Flask-SQLAlchemy binds replica0,
+# replica1, ... Views decorated with @replicas.read_only (outermost, above
+# @cache.cached) run their SELECTs on a replica chosen round-robin; flushes
+# and UPDATE/DELETE statements always go to the primary (see
+# dbpool.RoutingSession), and every other view keeps reading the primary.
+# A read falls back to the primary when:
+#   sticky       the browser sent a POST/DELETE in the last
+#                REPLICA_STICKY_SECONDS, so it sees its own writes after
+#                the redirect (a timestamp in the signed session cookie)
+#   invalidated  the view's cache namespace was invalidated within the
+#                replica lag bound, so a stale page is not cached under the
+#                new generation; shared by all workers with the redis cache
+#   lag          every replica is unreachable or more than
+#                REPLICA_MAX_LAG_SECONDS behind
+# Lag is measured at most every REPLICA_LAG_CHECK_SECONDS per process
+# (Postgres replay delay; other databases only get a connectivity check).
+#----------------------------------------------------------------------------#
+
+PG_REPLICA_LAG = '''
+SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+'''
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRouter(object):
+  def __init__(self, app=None, metrics=None):
+    self.names = []
+    self.metrics = None
+    self._lag = {}
+    self._turn = itertools.count()
+    if app is not None:
+      self.init_app(app, metrics)
+
+  def init_app(self, app, metrics=None):
+    self.logger = app.logger
+    self.metrics = metrics
+    if metrics is not None:
+      metrics.describe('fyyur_db_reads_total', 'counter', 'Requests of read-only views, by database bind and reason.')
+      metrics.describe('fyyur_db_replica_lag_seconds', 'gauge', 'Last measured replication lag, by replica.')
+      metrics.describe('fyyur_db_replica_up', 'gauge', 'Whether the last lag check reached the replica.')
+    self.configure(app, app.config.get('SQLALCHEMY_REPLICA_URIS') or ())
+    app.after_request(self._after_request)
+    app.extensions['replicas'] = self
+
+  def configure(self, app, uris):
+    # (re)binds the replicas; call before the first request
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for name in self.names:
+      binds.pop(name, None)
+    self.names = ['replica%d' % index for index, _ in enumerate(uris)]
+    binds.update(zip(self.names, uris))
+    app.config['SQLALCHEMY_BINDS'] = binds
+    self._lag = {}
+    # a page invalidated within this window is read from the primary
+    cache = app.extensions.get('response_cache')
+    if cache is not None:
+      cache.invalidation_window = math.ceil(
+        app.config['REPLICA_MAX_LAG_SECONDS'] + app.config['REPLICA_LAG_CHECK_SECONDS']) if uris else 0
+
+  def _after_request(self, response):
+    if self.names and request.method not in SAFE_METHODS:
+      session['_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+  def read_only(self, view):
+    # reads the view's cache namespace, so apply it above @cache.cached
+    namespace = getattr(view, 'cache_namespace', None)
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      if self.names:
+        name = namespace(*args, **kwargs) if callable(namespace) else namespace
+        # left set until the app context ends: streamed bodies query after the view returns
+        g._db_bind = self.choose(name)
+      return view(*args, **kwargs)
+    return wrapper
+
+  def choose(self, namespace=None):
+    # the bind name of a replica, or None for the primary
+    if session.get('_primary_until', 0) > time.time():
+      reason = 'sticky'
+    elif namespace and current_app.extensions['response_cache'].recently_invalidated(namespace):
+      reason = 'invalidated'
+    else:
+      max_lag = current_app.config['REPLICA_MAX_LAG_SECONDS']
+      for _ in self.names:
+        name = self.names[next(self._turn) % len(self.names)]
+        lag = self.lag(name)
+        if lag is not None and lag <= max_lag:
+          self._count(name, 'replica')
+          return name
+      reason = 'lag'
+    self._count('primary', reason)
+    return None
+
+  def lag(self, name):
+    # seconds behind the primary, None when unreachable; cached per process
+    checked = self._lag.get(name)
+    now = time.monotonic()
+    if checked is None or now - checked[0] >= current_app.config['REPLICA_LAG_CHECK_SECONDS']:
+      checked = self._lag[name] = (now, self._measure(name))
+    return checked[1]
+
+  def _measure(self, name):
+    engine = current_app.extensions['sqlalchemy'].db.get_engine(current_app, bind=name)
+    try:
+      with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+          return float(connection.scalar(PG_REPLICA_LAG))
+        connection.scalar('SELECT 1')
+        return 0.0
+    except Exception:
+      self.logger.warning('replica %s is unreachable', name, exc_info=True)
+      return None
+
+  def _count(self, bind, reason):
+    if self.metrics is not None:
+      self.metrics.inc('fyyur_db_reads_total', {'bind': bind, 'reason': reason})
+
+  def gauges(self):
+    # /metrics gauge source: the last lag checks and each replica's pool
+    db = current_app.extensions['sqlalchemy'].db
+    gauges = []
+    for name in self.names:
+      checked = self._lag.get(name)
+      if checked is not None:
+        gauges.append(('fyyur_db_replica_up', {'bind': name}, int(checked[1] is not None)))
+        if checked[1] is not None:
+          gauges.append(('fyyur_db_replica_lag_seconds', {'bind': name}, checked[1]))
+      pool = pool_stats(db.get_engine(current_app, bind=name))
+      for key, value in sorted((pool or {}).items()):
+        gauges.append(('fyyur_db_pool_%s' % key, {'bind': name}, value))
+    return gauges
@@ -0,0 +1,130 @@
+import bisect
+import datetime
+import itertools
+import re
+
+from sqlalchemy import exc, or_
+
+from config import db
+from models import *
+from jobs import enqueue
+
+#----------------------------------------------------------------------------#
+# Show scheduling.
+#
+# A residency or season is one venue, one artist and many start times,
+# given either as a recurrence rule (RFC 5545 RRULE, e.g.
+# FREQ=WEEKLY;BYDAY=FR;COUNT=12) anchored at the first start time, or as an
+# explicit list, all with the same duration. schedule_shows() checks both
+# ids in one query and every date against the existing bookings of the venue
+# and the artist in another, then inserts all rows with one multi-row
+# INSERT and queues the venue stats refresh (jobs.py). The caller commits,
+# so a season is listed whole or not at all. On Postgres the exclusion
+# constraints on show (models.py) also reject overlaps from concurrent
+# writers.
+#----------------------------------------------------------------------------#
+
+class ScheduleError(ValueError):
+  # nothing was written; `conflicts` holds the clashing start times, if any
+  def __init__(self, message, conflicts=()):
+    super(ScheduleError, self).__init__(message)
+    self.conflicts = sorted(conflicts)
+
+
+def expand_recurrence(first_start, pattern, max_dates):
+  # start times of an RRULE anchored at first_start, at most max_dates of them
+  # (dateutil is imported on first use, as it is only needed by the schedule forms)
+  from dateutil import rrule
+  try:
+    rule = rrule.rrulestr(pattern.strip(), dtstart=first_start)
+  except (ValueError, TypeError) as error:
+    raise ScheduleError('invalid recurrence %r: %s' % (pattern, error))
+  dates = list(itertools.islice(rule, max_dates + 1))
+  if len(dates) > max_dates:
+    raise ScheduleError('the recurrence yields more than %d dates; add COUNT or UNTIL' % max_dates)
+  return dates
+
+def parse_dates(text, max_dates):
+  # explicit start times, one per line or separated by commas
+  import dateutil.parser
+  values = [value.strip() for value in re.split(r'[\n,]', text or '') if value.strip()]
+  if len(values) > max_dates:
+    raise ScheduleError('at most %d dates can be scheduled at once' % max_dates)
+  dates = []
+  for value in values:
+    try:
+      dates.append(dateutil.parser.parse(value))
+    except (ValueError, OverflowError):
+      raise ScheduleError('invalid date %r' % value)
+  return dates
+
+
+def find_conflicts(venue_id, artist_id, intervals):
+  # existing shows of the venue or the artist overlapping any of the sorted,
+  # disjoint [start, end) intervals, in one query. Shows last at most
+  # MAX_SHOW_DURATION, so only the (venue_id, start_time) and (artist_id,
+  # start_time) index ranges between the first start minus that and the last
+  # end are read, however long the owners' histories are.
+  owners = []
+  if venue_id is not None:
+    owners.append(Show.venue_id == venue_id)
+  if artist_id is not None:
+    owners.append(Show.artist_id == artist_id)
+  if not owners or not intervals:
+    return []
+  candidates = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).filter(
+    or_(*owners), Show.start_time > intervals[0][0] - MAX_SHOW_DURATION, Show.start_time < intervals[-1][1],
+    Show.end_time > intervals[0][0]).order_by(Show.start_time, Show.id)
+
+  starts = [start for start, _ in intervals]
+  conflicts = []
+  for show in candidates:
+    # the last interval starting before the show ends is the only one that can reach into it
+    index = bisect.bisect_left(starts, show.end_time) - 1
+    if index >= 0 and intervals[index][1] > show.start_time:
+      conflicts.append(show)
+  return conflicts
+
+def show_intervals(start_times, duration=None):
+  # sorted [start, end) intervals of the distinct start times; raises
+  # ScheduleError if the duration is out of range or the shows would overlap
+  duration = duration or DEFAULT_SHOW_DURATION
+  if not datetime.timedelta(0) < duration <= MAX_SHOW_DURATION:
+    raise ScheduleError('shows last between 1 minute and %d hours' % (MAX_SHOW_DURATION.total_seconds() // 3600))
+  intervals = [(start_time, start_time + duration) for start_time in sorted(set(start_times))]
+  for (_, end), (start, _) in zip(intervals, intervals[1:]):
+    if start < end:
+      raise ScheduleError('the show at %s starts before the previous one ends' % start)
+  return intervals
+
+
+def schedule_shows(venue_id, artist_id, start_times, duration=None):
+  # inserts one show per distinct start time and returns their number; raises
+  # ScheduleError for unknown ids or when the venue or the artist is already
+  # booked during any of them
+  intervals = show_intervals(start_times, duration)
+  if not intervals:
+    raise ScheduleError('no dates to schedule')
+
+  venue_exists, artist_exists = db.session.query(
+    db.session.query(Venue.id).filter(Venue.id == venue_id).exists(),
+    db.session.query(Artist.id).filter(Artist.id == artist_id).exists()).one()
+  if not venue_exists:
+    raise ScheduleError('venue %s does not exist' % venue_id)
+  if not artist_exists:
+    raise ScheduleError('artist %s does not exist' % artist_id)
+
+  conflicts = find_conflicts(venue_id, artist_id, intervals)
+  if conflicts:
+    raise ScheduleError('%d of the dates clash with shows already listed' % len(conflicts),
+                        [show.start_time for show in conflicts])
+
+  try:
+    db.session.execute(Show.__table__.insert(), [
+      {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start, 'end_time': end} for start, end in intervals])
+  except exc.IntegrityError:
+    # the ids were checked above, so on Postgres this is an exclusion
+    # constraint: a clashing show was committed since find_conflicts()
+    raise ScheduleError('the dates clash with a show listed in the meantime')
+  enqueue('venue_stats.refresh', venue_ids=[venue_id])
+  return len(intervals)
@@ -0,0 +1,40 @@
+from flask import current_app
+from sqlalchemy import case, func
+
+from config import db
+
+#----------------------------------------------------------------------------#
+# Name search.
+#
+# On Postgres the venue/artist names carry pg_trgm GIN indexes (see migration
+# 8f3a6d2c41b7), so an ILIKE '%term%' filter is answered from the index and
+# results are ranked by trigram similarity. Other dialects (SQLite in tests)
+# fall back to a case-insensitive LIKE ranked exact > prefix > substring.
+#----------------------------------------------------------------------------#
+
+LIKE_ESCAPE = '\\'
+
+def _like_escape(term):
+  return term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace('%', LIKE_ESCAPE + '%').replace('_', LIKE_ESCAPE + '_')
+
+def _like_pattern(term):
+  return '%' + _like_escape(term) + '%'
+
+def search_by_name(model, term, limit=None):
+  # returns up to `limit` (id, name) rows of `model` whose name contains `term`, best match first
+  term = term.strip()
+  limit = limit or current_app.config['SEARCH_RESULT_LIMIT']
+  query = db.session.query(model.id, model.name)
+
+  if db.session.get_bind().dialect.name == 'postgresql':
+    query = query.filter(model.name.ilike(_like_pattern(term), escape=LIKE_ESCAPE)).order_by(
+      func.similarity(model.name, term).desc(), model.name)
+  else:
+    name, needle = func.lower(model.name), func.lower(term)
+    query = query.filter(name.like(_like_pattern(term.lower()), escape=LIKE_ESCAPE)).order_by(
+      case([(name == needle, 0), (name.like(_like_escape(term.lower()) + '%', escape=LIKE_ESCAPE), 1)], else_=2),
+      func.instr(name, needle),
+      func.length(model.name),
+      model.name)
+
+  return query.limit(limit).all()
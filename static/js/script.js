@@ -2,3 +2,40 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Forms with data-conflicts-url ask the API whether the venue or the artist
+// is already booked at that time before submitting. The server checks again
+// on submit; this only spares a round trip through the form.
+(function () {
+  var form = document.querySelector('form[data-conflicts-url]');
+  if (!form) {
+    return;
+  }
+  var warning = form.querySelector('.conflicts');
+  var checked = false;
+  form.addEventListener('submit', function (event) {
+    if (checked || !window.fetch) {
+      return;
+    }
+    event.preventDefault();
+    var params = ['venue_id', 'artist_id', 'start_time', 'duration'].map(function (name) {
+      return name + '=' + encodeURIComponent(form.elements[name].value.trim());
+    }).join('&');
+    fetch(form.getAttribute('data-conflicts-url') + '?' + params).then(function (response) {
+      return response.ok ? response.json() : {data: []};
+    }).then(function (payload) {
+      if (!payload.data.length) {
+        checked = true;
+        form.submit();
+        return;
+      }
+      warning.textContent = 'Already booked: ' + payload.data.map(function (show) {
+        return 'show ' + show.id + ' from ' + show.start_time.replace('T', ' ') + ' to ' + show.end_time.replace('T', ' ');
+      }).join('; ');
+      warning.style.display = '';
+    }, function () {
+      checked = true;
+      form.submit();
+    });
+  });
+}());
@@ -0,0 +1,50 @@
+import datetime
+
+from sqlalchemy import func
+
+from config import cache, db
+from jobs import job
+from models import *
+
+#----------------------------------------------------------------------------#
+# Venue stats.
+#
+# venue_stats keeps one row per venue with its number of upcoming shows and
+# the start_time of the next one. Writes that add shows queue a
+# venue_stats.refresh job for the affected venues (see jobs.py), bulk
+# imports refresh them inside their own transaction; sweep_venue_stats() catches
+# the shows that have since moved into the past and is meant to run
+# periodically (`flask venue-stats sweep`).
+#----------------------------------------------------------------------------#
+
+def refresh_venue_stats(venue_ids, now=None):
+  # recompute the counters of the given venues with one correlated UPDATE;
+  # it also sets their updated_at (onupdate), which the /venues ETag reads
+  venue_ids = list(venue_ids)
+  if not venue_ids:
+    return 0
+  now = now or datetime.datetime.now()
+  upcoming = db.session.query(Show.start_time).filter(Show.venue_id == VenueStats.venue_id, Show.start_time > now)
+  return db.session.query(VenueStats).filter(VenueStats.venue_id.in_(venue_ids)).update({
+    VenueStats.upcoming_shows: upcoming.with_entities(func.count(Show.id)).as_scalar(),
+    VenueStats.next_show_time: upcoming.with_entities(func.min(Show.start_time)).as_scalar(),
+  }, synchronize_session=False)
+
+@job('venue_stats.refresh')
+def refresh_venue_stats_job(venue_ids):
+  refresh_venue_stats(venue_ids)
+  # /venues renders the counts
+  return lambda: cache.invalidate('venues')
+
+def sweep_venue_stats(now=None):
+  # refresh only venues whose next show has started since the last refresh
+  now = now or datetime.datetime.now()
+  stale = [row.venue_id for row in db.session.query(VenueStats.venue_id).filter(VenueStats.next_show_time <= now)]
+  refresh_venue_stats(stale, now)
+  return len(stale)
+
+def rebuild_venue_stats(now=None):
+  # full rebuild; only needed after out-of-band writes to show
+  missing = db.session.query(Venue.id).outerjoin(VenueStats).filter(VenueStats.venue_id == None)
+  db.session.bulk_save_objects([VenueStats(venue_id=row.id) for row in missing])
+  return refresh_venue_stats([row.venue_id for row in db.session.query(VenueStats.venue_id)], now)
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# config.py reads these at import: always test against a throwaway SQLite
+# database, never the one DATABASE_URL points at
+os.environ.update(DATABASE_URL='sqlite://', CACHE_BACKEND='null', JOBS_EMBEDDED_WORKER='0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as fyyur_app
+from config import db
+
+
+@pytest.fixture
+def app():
+  with fyyur_app.app_context():
+    db.create_all()
+    yield fyyur_app
+    db.session.remove()
+    db.drop_all()
@@ -0,0 +1,74 @@
+import datetime
+
+from config import db
+from jobs import enqueue, job, run_next
+from models import Genre, Job
+
+calls = []
+
+@job('test_add_genre')
+def add_genre(name):
+  db.session.add(Genre(name=name))
+  db.session.flush()
+  return lambda: calls.append((name, db.session.query(Job).count()))
+
+@job('test_add_genre_and_fail')
+def add_genre_and_fail(name):
+  db.session.add(Genre(name=name))
+  db.session.flush()
+  raise RuntimeError('boom')
+
+def _enqueue(kind, **payload):
+  entry = enqueue(kind, **payload)
+  db.session.commit()
+  return entry.id
+
+def _later(seconds):
+  return datetime.datetime.now() + datetime.timedelta(seconds=seconds)
+
+
+def test_success_deletes_job_and_runs_after_commit(app):
+  del calls[:]
+  job_id = _enqueue('test_add_genre', name='Polka')
+  assert run_next().id == job_id
+  assert db.session.query(Job).get(job_id) is None
+  assert db.session.query(Genre).filter_by(name='Polka').count() == 1
+  # the callback runs once the job's deletion has committed
+  assert calls == [('Polka', 0)]
+  assert run_next() is None
+
+def test_failure_rolls_back_handler_work_and_retries(app):
+  job_id = _enqueue('test_add_genre_and_fail', name='Ska')
+  assert run_next().id == job_id
+  entry = db.session.query(Job).get(job_id)
+  assert entry.attempts == 1 and entry.failed_at is None
+  assert 'boom' in entry.last_error
+  assert entry.run_at > datetime.datetime.now()
+  assert db.session.query(Genre).filter_by(name='Ska').count() == 0
+  # backed off: not runnable until run_at
+  assert run_next() is None
+  assert run_next(now=_later(60)).id == job_id
+  assert db.session.query(Job).get(job_id).attempts == 2
+
+def test_failure_parks_job_at_max_attempts(app):
+  max_attempts, app.config['JOBS_MAX_ATTEMPTS'] = app.config['JOBS_MAX_ATTEMPTS'], 2
+  try:
+    job_id = _enqueue('test_add_genre_and_fail', name='Ska')
+    run_next()
+    run_next(now=_later(60))
+    entry = db.session.query(Job).get(job_id)
+    assert entry.attempts == 2 and entry.failed_at is not None
+    assert run_next(now=_later(3600)) is None
+  finally:
+    app.config['JOBS_MAX_ATTEMPTS'] = max_attempts
+
+def test_job_of_another_process_waits_for_owner_timeout(app):
+  entry = Job(kind='test_add_genre', payload='{"name": "Fado"}', owner='elsewhere:1')
+  db.session.add(entry)
+  db.session.commit()
+  job_id = entry.id
+  timeout = app.config['JOBS_OWNER_TIMEOUT']
+  assert run_next(now=_later(timeout - 5)) is None
+  assert db.session.query(Job).get(job_id) is not None
+  assert run_next(now=_later(timeout + 5)).id == job_id
+  assert db.session.query(Job).get(job_id) is None
@@ -1,6 +1,148 @@
+import base64
+import datetime
+import functools
+import hashlib
+import json
+import threading
+
+from flask import current_app, g, request, session
+from sqlalchemy import event
+
+from config import db
+
+
 def clean_venue_data(form_data):
     clean_form_data = {}
     form_data['seeking_talent'] = [True] if 'True' in form_data['seeking_talent'] else [False]
     for key, value in form_data.items():
         clean_form_data[key] = value[0]
-    return clean_form_data
\ No newline at end of file
+    return clean_form_data
+
+def encode_keyset(*values):
+    # opaque keyset cursor from JSON-serializable position values
+    payload = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_keyset(cursor, count):
+    # the `count` values encoded by encode_keyset; raises ValueError on anything else
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as error:
+        raise ValueError('invalid cursor: %r' % cursor) from error
+    if not isinstance(values, list) or len(values) != count:
+        raise ValueError('invalid cursor: %r' % cursor)
+    return values
+
+def decode_area_cursor(cursor):
+    # the (state, city) position of the /venues pages; raises ValueError on anything else
+    state, city = decode_keyset(cursor, 2)
+    if not isinstance(state, str) or not isinstance(city, str):
+        raise ValueError('invalid cursor: %r' % cursor)
+    return state, city
+
+def encode_cursor(start_time, show_id):
+    # opaque keyset cursor for the (start_time, id) ordering of shows
+    return encode_keyset(start_time.isoformat(), show_id)
+
+def decode_cursor(cursor):
+    # raises ValueError on anything that was not produced by encode_cursor
+    start_time, show_id = decode_keyset(cursor, 2)
+    try:
+        return datetime.datetime.fromisoformat(start_time), int(show_id)
+    except (TypeError, ValueError) as error:
+        raise ValueError('invalid cursor: %r' % cursor) from error
+
+def parse_show_filters(args):
+    # /shows query arguments as keyword arguments for queries.shows_page;
+    # raises ValueError on anything malformed
+    window = args.get('window', 'all')
+    if window not in ('all', 'upcoming', 'past'):
+        raise ValueError('invalid window: %r' % window)
+    page_size = min(args.get('limit', current_app.config['SHOWS_PAGE_SIZE'], type=int),
+                    current_app.config['SHOWS_MAX_PAGE_SIZE'])
+    if page_size < 1:
+        raise ValueError('invalid limit: %r' % page_size)
+    start = args.get('start')
+    end = args.get('end')
+    cursor = args.get('cursor')
+    return {
+        'window': window,
+        'start': datetime.datetime.strptime(start, '%Y-%m-%d') if start else None,
+        'end': datetime.datetime.strptime(end, '%Y-%m-%d') + datetime.timedelta(days=1) if end else None,
+        'cursor': decode_cursor(cursor) if cursor else None,
+        'page_size': page_size,
+    }
+
+def stream_template(template_name, **context):
+    # render a template as a generator so large pages are flushed in chunks
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(5)
+    return stream
+
+def query_budget(max_statements):
+    # assert that a view issues at most `max_statements` SQL statements,
+    # template rendering included; only checked when ENFORCE_QUERY_BUDGET is set
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('ENFORCE_QUERY_BUDGET'):
+                return view(*args, **kwargs)
+            statements = []
+            thread = threading.get_ident()
+            def count_statement(conn, cursor, statement, parameters, context, executemany):
+                # the engine is shared with other requests and the job worker thread
+                if threading.get_ident() == thread:
+                    statements.append(statement)
+            engine = db.get_engine(bind=g.get('_db_bind'))
+            event.listen(engine, 'before_cursor_execute', count_statement)
+            try:
+                response = view(*args, **kwargs)
+            finally:
+                event.remove(engine, 'before_cursor_execute', count_statement)
+            assert len(statements) <= max_statements, '%s issued %d SQL statements (budget %d):\n%s' % (
+                view.__name__, len(statements), max_statements, '\n'.join(statements))
+            return response
+        return wrapper
+    return decorator
+
+def validator_etag(validated):
+    return hashlib.md5(repr((current_app.config['ETAG_VERSION'], request.full_path,
+                             validated.fingerprint)).encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+def set_validators(response, etag, validated):
+    if response.status_code == 200:
+        response.set_etag(etag)
+        if validated.last_modified:
+            # informational only; freshness is decided by the ETag because
+            # pages also change when shows move into the past
+            response.last_modified = validated.last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def conditional(validator):
+    # answer If-None-Match with 304 from `validator(**view_args)` alone (a
+    # queries.Validator, or None to skip), before
+    # the view touches the database for its body or renders a template.
+    # Apply it below @cache.cached: a cache hit answers from the stored
+    # response and its ETag without running the validator.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # flash messages are part of the page, so never let a browser reuse it
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            validated = validator(*args, **kwargs)
+            if validated is None:
+                return view(*args, **kwargs)
+            etag = validator_etag(validated)
+            if etag in request.if_none_match:
+                return not_modified(etag)
+            return set_validators(current_app.make_response(view(*args, **kwargs)), etag, validated)
+        return wrapper
+    return decorator
@@ -0,0 +1,34 @@
+from config import cache, db
+from models import *
+from jobs import job
+
+#----------------------------------------------------------------------------#
+# HTML views, one blueprint per subsystem (registered by create_app in app.py):
+#
+#   pages    home page, error pages and the template filters
+#   venues   /venues
+#   artists  /artists
+#   shows    /shows
+#
+# Endpoints carry the blueprint name: url_for('venues.show_venue', ...).
+# The views import forms (WTForms) on first use, so processes that never
+# render a form (job workers, `flask db`) do not load it.
+#----------------------------------------------------------------------------#
+
+def venue_cache_namespaces(venue_id):
+  # every cached page that renders this venue's name or shows
+  return ['show_venue:%s' % venue_id, 'venues', 'shows'] + related_cache_namespaces(venue_id=venue_id)
+
+def related_cache_namespaces(venue_id=None, artist_id=None):
+  # the pages of the artists who played the venue, or of the venues the artist played
+  if venue_id is not None:
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return ['show_artist:%s' % row.artist_id for row in artist_ids]
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return ['show_venue:%s' % row.venue_id for row in venue_ids]
+
+@job('cache.invalidate_related')
+def invalidate_related_pages(venue_id=None, artist_id=None):
+  # queued by the edit forms: a venue or artist can appear on hundreds of other pages
+  namespaces = related_cache_namespaces(venue_id, artist_id)
+  return lambda: cache.invalidate(*namespaces)
@@ -0,0 +1,139 @@
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from config import cache, db, replicas
+from models import *
+from utils import query_budget, conditional
+from search import search_by_name
+from queries import artist_detail, artist_list, artist_for_edit, artist_validator, artists_validator
+from lookups import genre_ids
+from jobs import enqueue
+
+artists_pages = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+@artists_pages.route('/artists')
+@cache.cached('artists')
+@conditional(artists_validator)
+def artists():
+  #   genre: only artists tagged with this genre
+  genre = request.args.get('genre')
+  data = [{'id': artist.id,
+          'name': artist.name}
+          for artist in artist_list(genre)]
+  return render_template('pages/artists.html', artists=data, genre=genre)
+
+@artists_pages.route('/artists/search', methods=['POST'])
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  serach_term = request.form.get('search_term', '')
+  artists = search_by_name(Artist, serach_term)
+  response = {'count': len(artists),
+  'data': [{'id': artist.id, 'name': artist.name} for artist in artists]}
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@artists_pages.route('/artists/<int:artist_id>')
+@replicas.read_only
+@cache.cached(lambda artist_id: 'show_artist:%s' % artist_id)
+@conditional(artist_validator)
+@query_budget(2)
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  data = artist_detail(artist_id)
+  if data is None:
+    abort(404)
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+@artists_pages.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+
+  # TODO: populate form with fields from artist with ID <artist_id>
+  from forms import ArtistForm
+  artist = artist_for_edit(artist_id)
+  form = ArtistForm(obj=artist)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@artists_pages.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  from forms import ArtistForm
+  form = ArtistForm()
+  if not form.validate_on_submit():
+    flash('An error occured. Artist ' + (' ,').join(list(form.errors.keys()))+ ' fields are invalid')
+    return redirect(url_for('artists.edit_artist', artist_id=artist_id))
+  try:
+    results = form.data
+    genre_data = results['genres']
+    del results['genres']
+    del results['csrf_token']
+    db.session.query(Artist).filter(Artist.id == artist_id).update(results)
+
+    db.session.query(GenreTagsForArtists).filter(GenreTagsForArtists.artist_id == artist_id).delete()
+    genre_entries = [GenreTagsForArtists(artist_id = artist_id, genre_id = genre_id) for genre_id in genre_ids(genre_data).values()]
+    db.session.bulk_save_objects(genre_entries)
+    enqueue('cache.invalidate_related', artist_id=artist_id)
+
+    db.session.commit()
+    cache.invalidate('show_artist:%s' % artist_id, 'artists', 'shows')
+
+    flash('Artist ' + request.form['name'] + ' was successfully updated!')
+
+  except:
+    db.session.rollback()
+    flash('An error occured. Artist ' + request.form['name'] + ' could not be updated. Try again.')
+    current_app.logger.exception('%s failed', request.endpoint)
+
+  finally:
+    db.session.close()
+
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists_pages.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@artists_pages.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+
+  # on successful db insert, flash success
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  from forms import ArtistForm
+  form = ArtistForm()
+  if not form.validate_on_submit():
+    flash('An error occured. Venue ' + (' ,').join(list(form.errors.keys()))+ ' fields are invalid')
+    return redirect('/')
+  try:
+    results = form.data
+    genre_data = results['genres']
+    del results['genres']
+    del results['csrf_token']
+    # artist and genre tags go out in one flush and one commit
+    new_artist = Artist(**results)
+    new_artist.genres = [GenreTagsForArtists(genre_id = genre_id) for genre_id in genre_ids(genre_data).values()]
+    db.session.add(new_artist)
+    db.session.commit()
+    cache.invalidate('artists')
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+
+  except:
+    db.session.rollback()
+    flash('An error occured. Artist ' + request.form['name'] + ' could not be listed. Try again.')
+    current_app.logger.exception('%s failed', request.endpoint)
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
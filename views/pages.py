@@ -0,0 +1,54 @@
+import functools
+
+from flask import Blueprint, render_template
+
+from config import cache
+
+pages = Blueprint('pages', __name__)
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# babel and dateutil are imported by the first page that formats a date
+
+@functools.lru_cache(maxsize=None)
+def _datetime_pattern(format):
+  # compiled once per format name (or literal Babel pattern) per process
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@functools.lru_cache(maxsize=None)
+def _datetime_locale():
+  import babel
+  return babel.Locale.parse(babel.default_locale('LC_TIME'))
+
+@pages.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+  # views pass datetime objects; strings are still accepted but parsed
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  return _datetime_pattern(format).apply(value, _datetime_locale())
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@pages.route('/')
+@cache.cached('index')
+def index():
+  return render_template('pages/home.html')
+
+@pages.app_errorhandler(404)
+def not_found_error(error):
+  return render_template('errors/404.html'), 404
+
+@pages.app_errorhandler(500)
+def server_error(error):
+  return render_template('errors/500.html'), 500
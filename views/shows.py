@@ -0,0 +1,115 @@
+import datetime
+
+from flask import Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, abort
+from flask import stream_with_context
+
+from config import cache, db, replicas
+from utils import parse_show_filters, stream_template, conditional
+from queries import shows_page, show_data, shows_validator
+from schedule import ScheduleError, expand_recurrence, parse_dates, schedule_shows
+
+shows_pages = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@shows_pages.route('/shows')
+@replicas.read_only
+@cache.cached('shows')
+@conditional(shows_validator)
+def shows():
+  # displays list of shows at /shows, one keyset page at a time.
+  #   window: all | upcoming | past, optionally narrowed with start/end (YYYY-MM-DD)
+  #   cursor: opaque (start_time, id) position returned as next_url of the previous page
+  try:
+    filters = parse_show_filters(request.args)
+  except ValueError:
+    abort(400)
+
+  rows, next_cursor = shows_page(**filters)
+  next_url = None
+  if next_cursor:
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    next_url = url_for('shows.shows', **args)
+
+  data = (show_data(row) for row in rows)
+  return Response(stream_with_context(stream_template('pages/shows.html', shows=data, window=filters['window'], next_url=next_url)))
+
+@shows_pages.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@shows_pages.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  from forms import ShowForm
+  form = ShowForm()
+  if not form.validate_on_submit():
+    flash('An error occured. show ' + (' ,').join(list(form.errors.keys()))+ ' fields are invalid')
+    return redirect(url_for('shows.create_shows'))
+  try:
+    # the same checks as a season of one: both ids exist, no overlapping booking
+    schedule_shows(form.venue_id.data, form.artist_id.data, [form.start_time.data], _duration(form))
+    db.session.commit()
+    cache.invalidate('show_venue:%s' % form.venue_id.data, 'show_artist:%s' % form.artist_id.data, 'shows', 'venues')
+    flash('Show was successfully listed!')
+
+  except ScheduleError as error:
+    db.session.rollback()
+    flash('Show could not be listed: %s' % error)
+
+  except:
+    db.session.rollback()
+    current_app.logger.exception('%s failed', request.endpoint)
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+
+def _duration(form):
+  return datetime.timedelta(minutes=form.duration.data) if form.duration.data else None
+
+@shows_pages.route('/shows/schedule')
+def schedule_shows_form():
+  from forms import ScheduleShowsForm
+  form = ScheduleShowsForm()
+  return render_template('forms/schedule_shows.html', form=form)
+
+@shows_pages.route('/shows/schedule', methods=['POST'])
+def schedule_shows_submission():
+  # lists a residency or season: every date goes out in one INSERT and one commit
+  from forms import ScheduleShowsForm
+  form = ScheduleShowsForm()
+  if not form.validate_on_submit():
+    flash('An error occured. shows ' + (' ,').join(list(form.errors.keys()))+ ' fields are invalid')
+    return render_template('forms/schedule_shows.html', form=form)
+  max_dates = current_app.config['SHOW_SCHEDULE_MAX_DATES']
+  try:
+    if form.recurrence.data:
+      if form.start_time.data is None:
+        raise ScheduleError('a recurrence starts at the start time of the first show')
+      start_times = expand_recurrence(form.start_time.data, form.recurrence.data, max_dates)
+    else:
+      start_times = [form.start_time.data] if form.start_time.data else []
+    start_times += parse_dates(form.dates.data, max_dates)
+    scheduled = schedule_shows(form.venue_id.data, form.artist_id.data, start_times, _duration(form))
+    db.session.commit()
+    cache.invalidate('show_venue:%s' % form.venue_id.data, 'show_artist:%s' % form.artist_id.data, 'shows', 'venues')
+    flash('%d shows were successfully listed!' % scheduled)
+
+  except ScheduleError as error:
+    db.session.rollback()
+    flash('Shows could not be listed: %s' % error)
+    return render_template('forms/schedule_shows.html', form=form, conflicts=error.conflicts)
+
+  except:
+    db.session.rollback()
+    flash('An error occured. Shows could not be listed. Try again.')
+    current_app.logger.exception('%s failed', request.endpoint)
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
@@ -0,0 +1,173 @@
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from config import cache, db, replicas
+from models import *
+from utils import query_budget, conditional, encode_keyset, decode_area_cursor
+from search import search_by_name
+from queries import venue_detail, venue_areas, venue_for_edit, venue_validator, venues_validator
+from lookups import area_id, genre_ids
+from jobs import enqueue
+from views import venue_cache_namespaces
+
+venues_pages = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@venues_pages.route('/venues')
+@replicas.read_only
+@cache.cached('venues')
+@conditional(venues_validator)
+def venues():
+  # venues grouped by area, VENUE_AREAS_PAGE_SIZE areas per page.
+  #   genre: only venues tagged with this genre
+  #   cursor: opaque (state, city) position returned as next_url of the previous page
+  cursor = request.args.get('cursor')
+  try:
+    after = decode_area_cursor(cursor) if cursor else None
+  except ValueError:
+    abort(400)
+
+  genre = request.args.get('genre')
+  data, next_after = venue_areas(after, current_app.config['VENUE_AREAS_PAGE_SIZE'], genre)
+  next_url = url_for('venues.venues', genre=genre, cursor=encode_keyset(*next_after)) if next_after else None
+  return render_template('pages/venues.html', areas=data, genre=genre, next_url=next_url)
+
+@venues_pages.route('/venues/search', methods=['POST'])
+def search_venues():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  serach_term = request.form.get('search_term', '')
+  venues = search_by_name(Venue, serach_term)
+  response = {'count': len(venues),
+  'data': [{'id': venue.id, 'name': venue.name} for venue in venues]}
+
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@venues_pages.route('/venues/<int:venue_id>')
+@replicas.read_only
+@cache.cached(lambda venue_id: 'show_venue:%s' % venue_id)
+@conditional(venue_validator)
+@query_budget(2)
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  data = venue_detail(venue_id)
+  if data is None:
+    abort(404)
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@venues_pages.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  form.validate_on_submit()
+  return render_template('forms/new_venue.html', form=form)
+
+@venues_pages.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  from forms import VenueForm
+  form = VenueForm()
+  if not form.validate_on_submit():
+    flash('An error occured. Venue ' + (' ,').join(list(form.errors.keys()))+ ' fields are invalid')
+    return render_template('pages/home.html')
+  try:
+    results = form.data
+    genre_data = results['genres']
+    del results['genres']
+    del results['csrf_token']
+    # venue, genre tags and stats row go out in one flush and one commit
+    new_venue = Venue(**results)
+    new_venue.area_id = area_id(new_venue.city, new_venue.state)
+    new_venue.genres = [GenreTagsForVenues(genre_id = genre_id) for genre_id in genre_ids(genre_data).values()]
+    new_venue.stats = VenueStats()
+    db.session.add(new_venue)
+    db.session.commit()
+    cache.invalidate('venues')
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+
+  except:
+    db.session.rollback()
+    flash('An error occured. Venue ' + request.form['name'] + ' could not be listed. Try again.')
+    current_app.logger.exception('%s failed', request.endpoint)
+
+  finally:
+    db.session.close()
+
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return render_template('pages/home.html')
+
+@venues_pages.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  try:
+    namespaces = venue_cache_namespaces(venue_id)
+    db.session.delete(db.session.query(Venue).get(venue_id))
+    db.session.commit()
+    cache.invalidate(*namespaces)
+    flash('Venue was successfully deleted!')
+
+  except:
+    db.session.rollback()
+    flash('An error occured. Venue  could not be listed. Try again.')
+    current_app.logger.exception('%s failed', request.endpoint)
+  finally:
+    db.session.close()
+  return redirect(url_for('venues.venues'))
+
+#  Update
+#  ----------------------------------------------------------------
+
+@venues_pages.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  venue = venue_for_edit(venue_id)
+  form = VenueForm(obj = venue)
+  #form = VenueForm(obj=venue)
+  # TODO: populate form with values from venue with ID <venue_id>
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@venues_pages.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  from forms import VenueForm
+  form = VenueForm()
+  if not form.validate_on_submit():
+    flash('An error occured. Venue ' + (' ,').join(list(form.errors.keys()))+ ' fields are invalid')
+    return render_template('pages/home.html')
+  try:
+    results = form.data
+    genre_data = results['genres']
+    del results['genres']
+    del results['csrf_token']
+    results['area_id'] = area_id(results['city'], results['state'])
+    db.session.query(Venue).filter(Venue.id == venue_id).update(results)
+
+    db.session.query(GenreTagsForVenues).filter(GenreTagsForVenues.venue_id == venue_id).delete()
+    genre_entries = [GenreTagsForVenues(venue_id = venue_id, genre_id = genre_id) for genre_id in genre_ids(genre_data).values()]
+    db.session.bulk_save_objects(genre_entries)
+    enqueue('cache.invalidate_related', venue_id=venue_id)
+
+    db.session.commit()
+    cache.invalidate('show_venue:%s' % venue_id, 'venues', 'shows')
+
+    flash('Venue ' + request.form['name'] + ' was successfully updated!')
+
+  except:
+    db.session.rollback()
+    flash('An error occured. Venue ' + request.form['name'] + ' could not be updated. Try again.')
+    current_app.logger.exception('%s failed', request.endpoint)
+
+  finally:
+    db.session.close()
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))
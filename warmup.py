@@ -0,0 +1,113 @@
+import datetime
+import gc
+import importlib
+import os
+import tempfile
+import time
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+#----------------------------------------------------------------------------#
+# Template bytecode cache and warm-up.
+#
+# Jinja compiles each template to Python on first use in every process.
+# With TEMPLATE_CACHE_DIR set, the compiled code is also kept on disk, keyed
+# by template name and source checksum, so other workers and later deploys
+# only unmarshal it; an edited template simply gets a new entry.
+# `flask templates compile` fills the cache for every template and fails on
+# a template that does not compile; run it on deploy, before the workers
+# start. `flask warmup` does that and then requests every GET route once.
+#
+# warm_up(app) is also meant for a server's post-fork hook: the first real
+# request of a worker then finds templates loaded, mappers configured and
+# the Babel patterns parsed. See benchmarks/cold_start.py for the effect.
+#
+# A preforking server that loads the app in its master (gunicorn
+# --preload, see gunicorn.conf.py) calls preload(app) before forking
+# instead: the workers then share the imported modules and compiled
+# templates copy-on-write, and after_fork(app) in each worker drops any
+# database connection inherited from the master.
+#----------------------------------------------------------------------------#
+
+# route argument -> table to take a sample id from
+SAMPLE_IDS = {'venue_id': 'venue', 'artist_id': 'artist'}
+
+# modules the views import on first use (see app.py)
+DEFERRED_IMPORTS = ('forms', 'babel.dates', 'dateutil.parser', 'dateutil.rrule')
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+  # writes through a temporary file, so a worker never reads a half-written entry
+  def dump_bytecode(self, bucket):
+    handle, path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+    try:
+      with os.fdopen(handle, 'wb') as output:
+        bucket.write_bytecode(output)
+      os.replace(path, self._get_cache_filename(bucket))
+    except BaseException:
+      os.remove(path)
+      raise
+
+
+def init_bytecode_cache(app):
+  directory = app.config.get('TEMPLATE_CACHE_DIR')
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = TemplateBytecodeCache(directory, 'fyyur-%s.cache')
+
+def precompile_templates(app):
+  # compiles every template (into the bytecode cache, if configured); returns their names
+  names = app.jinja_env.list_templates(extensions=['html'])
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
+
+
+def _sample_ids(db):
+  samples = {}
+  for argument, table in SAMPLE_IDS.items():
+    value = db.session.execute(text('SELECT min(id) FROM %s' % table)).scalar()
+    if value is not None:
+      samples[argument] = value
+  db.session.remove()
+  return samples
+
+def warm_up(app):
+  # requests every GET route that needs no arguments or only sample ids;
+  # returns (path, status, milliseconds) per request
+  with app.app_context():
+    samples = _sample_ids(app.extensions['sqlalchemy'].db)
+  adapter = app.url_map.bind('localhost')
+  client = app.test_client()
+  results = []
+  for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+    if 'GET' not in rule.methods or rule.endpoint == 'static' or not set(rule.arguments) <= set(samples):
+      continue
+    path = adapter.build(rule.endpoint, {argument: samples[argument] for argument in rule.arguments})
+    started = time.perf_counter()
+    response = client.get(path)
+    response.get_data()
+    response.close()
+    results.append((path, response.status_code, (time.perf_counter() - started) * 1000))
+  return results
+
+
+def preload(app):
+  # loads, without a request or a database connection, what every worker would
+  # load by itself, then moves it all out of the collector's reach: a collection
+  # in a worker would otherwise write to (and so copy) every shared page
+  from views.pages import DATETIME_FORMATS, format_datetime
+  for name in DEFERRED_IMPORTS:
+    importlib.import_module(name)
+  precompile_templates(app)
+  configure_mappers()
+  for format in DATETIME_FORMATS:
+    format_datetime(datetime.datetime.now(), format)
+  gc.freeze()
+
+def after_fork(app):
+  # pooled connections must not be shared between processes
+  with app.app_context():
+    app.extensions['sqlalchemy'].db.get_engine().dispose()
@@ -0,0 +1,16 @@
+#----------------------------------------------------------------------------#
+# python worker.py [--once] [--poll-interval SECONDS] [--metrics-port PORT]
+#
+# `flask jobs work` without the flask command, which imports every
+# installed Flask extension's commands (Flask-Migrate and Alembic among
+# them) before it starts. Same options, a third less start-up time; see
+# benchmarks/importtime.py.
+#----------------------------------------------------------------------------#
+
+from flask.cli import ScriptInfo
+
+from app import create_app
+from commands import jobs_work_command
+
+if __name__ == '__main__':
+  jobs_work_command.main(prog_name='worker.py', obj=ScriptInfo(create_app=create_app))